@@ -0,0 +1,177 @@
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from search_cache import normalize_query
+
+_PRIME = (1 << 61) - 1
+
+
+def _stem(word):
+    # Plurals only: "works" and "work" are the same question, "unstake" and "stake" are not
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def shingles(text):
+    """
+    Words and word pairs of the normalized query. A single changed word
+    ("stake"/"unstake", "usdc"/"usdt", "not") costs a word and both pairs it
+    is in, where character k-grams barely move.
+    """
+    words = [_stem(w) for w in normalize_query(text).split()]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+
+
+class MinHasher:
+    """MinHash signatures over shingle sets; equal slots estimate Jaccard similarity."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [_hash(s) for s in shingle_set] or [0]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class _Entry:
+    __slots__ = ("key", "version", "shingles", "signature", "response", "raw", "created")
+
+    def __init__(self, key, version, shingles, signature, response, raw):
+        self.key = key
+        self.version = version
+        self.shingles = shingles
+        self.signature = signature
+        self.response = response
+        self.raw = raw
+        self.created = time.monotonic()
+
+
+class AnswerCache:
+    """
+    Near-duplicate answer cache for first-turn questions.
+
+    Entries are keyed by the normalized query and the system prompt version.
+    Lookups first try the exact normalized form, then MinHash LSH candidates
+    (`bands` bands of the signature) whose word-shingle Jaccard similarity,
+    computed exactly, is at least `threshold`. At most `max_entries` answers are kept (least recently used
+    evicted first), each for `ttl` seconds.
+    """
+
+    def __init__(self, ttl=3600, max_entries=1024, threshold=0.9, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def get(self, query, version):
+        """Returns (response, raw output, similarity, age in seconds) or None."""
+        key = (normalize_query(query), version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            similarity = 1.0
+            counter = "hits"
+            if entry is None:
+                entry, similarity = self._nearest(shingles(query), version, now)
+                counter = "near_hits"
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(entry.key)
+            self._counters[counter] += 1
+            return entry.response, entry.raw, round(similarity, 4), now - entry.created
+
+    def put(self, query, version, response, raw):
+        """`response` is the serialized JSON payload, `raw` the model output kept for history."""
+        key = (normalize_query(query), version)
+        shingle_set = shingles(query)
+        entry = _Entry(key, version, shingle_set, self.hasher.signature(shingle_set), response, raw)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            for band in self._bands(entry.signature, version):
+                self._buckets.setdefault(band, set()).add(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+            stats["size"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["hit_ratio"] = round((stats["hits"] + stats["near_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    # --- internals (caller holds self._lock) ---
+
+    def _bands(self, signature, version):
+        for i in range(self.bands):
+            yield (version, i, signature[i * self.rows:(i + 1) * self.rows])
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and now - entry.created > self.ttl:
+            self._drop(key)
+            self._counters["expired"] += 1
+            return None
+        return entry
+
+    def _nearest(self, shingle_set, version, now):
+        signature = self.hasher.signature(shingle_set)
+        candidates = set()
+        for band in self._bands(signature, version):
+            candidates.update(self._buckets.get(band, ()))
+        best, best_similarity = None, 0.0
+        for key in candidates:
+            entry = self._live(key, now)
+            if entry is None:
+                continue
+            # The signature only finds candidates; its estimate is too noisy to decide a hit
+            similarity = jaccard(shingle_set, entry.shingles)
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        return best, best_similarity
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        for band in self._bands(entry.signature, entry.version):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
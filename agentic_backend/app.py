@@ -1,19 +1,57 @@
-from flask import Flask, request, Response, jsonify
+from flask import Flask, request, Response, jsonify, stream_with_context, g
 from flask_cors import CORS
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_groq import ChatGroq
 import uuid
-from helpers import get_mixed_prompt
-from tools import get_crypto_prices, search_web
+from tools import search_cache, price_cache
+from intents import classify_intent, intent_response
+from stream_parser import SegmentStreamParser
+import executors
+import upstream
+from executors import Saturated
+from image import CACHE_CONTROL as IMAGE_CACHE_CONTROL, DEFAULT_SIZE
+from pipeline import (
+    conversation_history, llm_pool, answer_cache, init_llms, prepare_turn, parse_llm_output,
+    error_response, quote_data, quote_batch, cached_answer, remember_answer, record_reply,
+    trigger_engine, register_order, prefetcher, observe_query, prefetch_suggestions,
+    image_proxy, proxy_asset_images, parse_classify_body, classify_batch, classify_done,
+    start_batch_routing, route_batch_events,
+)
+import metrics
+from metrics import stage, record_usage
+import hmac
 import json
+import logging
 import os
-import re
-from concurrent.futures import ThreadPoolExecutor
+import time
+from collections import Counter
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["Server-Timing"])
+
+@app.before_request
+def start_timings():
+    g.timings = metrics.start_request()
+
+@app.after_request
+def add_server_timing(response):
+    # For streamed replies this covers the work done before the first byte
+    timings = getattr(g, "timings", None)
+    if timings is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unknown"
+        metrics.REQUEST_SECONDS.observe(timings.elapsed(), endpoint, response.status_code)
+        if timings.stages:
+            response.headers["Server-Timing"] = timings.header()
+    return response
 
-conversation_history = {}
+# Prometheus scrape endpoint: stage latency histograms and LLM token counters
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
 
 # Quote endpoint for getting swap estimates
 @app.route('/quote', methods=['GET'])
@@ -26,373 +64,319 @@ def get_quote():
         return jsonify({"error": "Missing required parameters: token_in, token_out, amount_in"}), 400
     
     try:
-        # Mock quote calculation (replace with actual DeepBook/Uniswap API call)
-        estimated_out = float(amount_in) * 0.95  # Simple 5% slippage estimate
-        
-        quote_data = {
-            "token_in": token_in,
-            "token_out": token_out,
-            "amount_in": amount_in,
-            "estimated_out": str(estimated_out),
-            "slippage": "0.05",
-            "price_impact": "0.01"
-        }
-        
-        return jsonify(quote_data)
+        return jsonify(quote_data(token_in, token_out, amount_in))
+    except ValueError as e:
+        # Non-numeric amount, unknown pair or not enough depth
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Quote calculation failed: {str(e)}"}), 500
 
-@app.route('/chat', methods=['GET'])
-def chat():
+# Batch quotes: many pairs/amounts per call, vectorized per pair
+@app.route('/quotes', methods=['POST'])
+def get_quotes():
+    try:
+        return jsonify(quote_batch(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# Server-side take-profit / stop-loss orders
+@app.route('/orders', methods=['POST', 'DELETE'])
+def orders():
+    if request.method == 'DELETE':
+        order_id = request.args.get('order_id', type=int)
+        owner = request.args.get('owner')
+        if order_id is None or not owner:
+            return jsonify({"error": "Missing required parameters: order_id, owner"}), 400
+        return jsonify({"cancelled": trigger_engine.cancel(order_id, owner)})
+
+    try:
+        return jsonify(register_order(request.get_json(silent=True))), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# Poll fired orders: returns events with seq > since
+@app.route('/orders/events', methods=['GET'])
+def order_events():
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({"events": trigger_engine.events(since, limit), "last_seq": trigger_engine.stats()["last_seq"]})
+
+# Asset images downscaled to a card size; rendered once, then served from disk
+@app.route('/image', methods=['GET'])
+def image_thumbnail():
+    url = request.args.get('url')
+    if not url:
+        return jsonify({"error": "Missing required parameter: url"}), 400
+    if not image_proxy.verify(url, request.args.get('sig')):
+        return jsonify({"error": "Image URL is not signed by this server"}), 403
+
+    try:
+        digest, content_type, data = image_proxy.get(url, request.args.get('size', DEFAULT_SIZE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Saturated:
+        raise
+    except Exception as e:
+        # Unreachable, not an image, or timed out rendering
+        return jsonify({"error": f"Image unavailable: {str(e)}"}), 502
+
+    response = Response(data, content_type=content_type, headers={"Cache-Control": IMAGE_CACHE_CONTROL})
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
+@app.errorhandler(Saturated)
+def server_busy(e):
+    # Back-pressure: fail fast instead of queueing behind a saturated pool
+    log.warning("Rejecting request: %s", e)
+    return jsonify({"error": "Server is busy, please retry shortly."}), 503, {"Retry-After": "1"}
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        "status": "ok",
+        "llm_pool": llm_pool.stats(),
+        "conversations": conversation_history.stats(),
+        "price_cache": price_cache.stats(),
+        "executors": executors.stats(),
+        "upstreams": upstream.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "orders": trigger_engine.stats(),
+        "prefetch": prefetcher.stats() if prefetcher else None,
+        "images": image_proxy.stats()
+    })
+
+def is_admin_request():
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set and sent as X-Admin-Token."""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    # Header only: a query parameter would end up in access and proxy logs
+    presented = request.headers.get("X-Admin-Token")
+    if not admin_token or not presented:
+        return False
+    return hmac.compare_digest(presented.encode(), admin_token.encode())
+
+# Inspect or purge the search-result cache
+@app.route('/admin/search-cache', methods=['GET', 'DELETE'])
+def admin_search_cache():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+
+    if request.method == 'DELETE':
+        removed = search_cache.purge(category=request.args.get('category'), query=request.args.get('query'))
+        return jsonify({"removed": removed})
+
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({"stats": search_cache.stats(), "entries": search_cache.entries(limit)})
+
+def parse_chat_args():
+    """
+    Read and validate the /chat query parameters.
+    Returns (query, conversation_id, api_key, error_response).
+    """
     query = request.args.get('query')
     conversation_id = request.args.get('conversation_id')
     api_key = request.args.get('api_key')
 
     if not query:
-        return Response("Error: Query parameter is required", status=400, content_type="text/plain")
+        return None, None, None, Response("Error: Query parameter is required", status=400, content_type="text/plain")
     
     if not api_key:
-        return Response("Error: Groq API Key is required. Please set it in the settings.", status=401, content_type="text/plain")
+        return None, None, None, Response("Error: Groq API Key is required. Please set it in the settings.", status=401, content_type="text/plain")
+
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+
+    return query, conversation_id, api_key, None
+
+@app.route('/chat', methods=['GET'])
+def chat():
+    query, conversation_id, api_key, error = parse_chat_args()
+    if error:
+        return error
+    observe_query(conversation_id, query)
+
+    # --- AGENT 1: REGEX INTENT DETECTION ---
+    # Swap, TP/SL and price-check grammars are compiled once in intents.py.
+    # Runs before the LLMs are initialized so these never load LangChain.
+    with stage("intent"):
+        intent = classify_intent(query)
+    if intent:
+        log.debug("Intent detected via regex: %s", intent)
+        return jsonify(intent_response(intent))
 
     # Initialize LLMs
     try:
-        # Fast model for intent routing (Lightning-quick classification)
-        fast_llm = ChatGroq(model="llama-3.1-8b-instant", api_key=api_key)
-        # Primary model for deep reasoning and formatting
-        llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=api_key)
+        fast_llm, llm = init_llms(api_key)
     except Exception as e:
         return jsonify({"error": f"Invalid API Key or LLM initialization failed: {str(e)}"}), 401
 
-    if not conversation_id:
-        conversation_id = str(uuid.uuid4())
+    cached = cached_answer(query, conversation_id)
+    if cached:
+        prefetch_suggestions(conversation_id, cached, fast_llm)
+        return jsonify(cached)
 
-    # Fetch real-time crypto data if context implies trading
-    keywords = ['price', 'market', 'trading', 'bitcoin', 'btc', 'ethereum', 'eth', 'sui', 'solana', 'sol', 'crypto', 'trend']
-    market_context = ""
-    if any(k in query.lower() for k in keywords):
-        print("Fetching market data...")
-        prices = get_crypto_prices() # Fetches default set (btc, eth, sui, sol)
-        if prices:
-             market_context = f"\n[REAL-TIME MARKET DATA]: {json.dumps(prices, indent=2)}\nUse this data to answer questions about current prices."
-
-    # --- AGENT 1: SIMPLE SWAP DETECTION ---
-    # Check for swap intents using regex first (faster and more reliable)
-    import re
-    swap_patterns = [
-        r'swap\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
-        r'swap\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', 
-        r'trade\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
-        r'trade\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
-        r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
-        r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
-        r'convert\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
-        r'convert\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
-        # Additional patterns for more natural language
-        r'sell\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
-        r'buy\s+(\w+)\s+with\s+(\d*\.?\d+)\s+(\w+)',  # Special case: buy TOKEN with AMOUNT TOKEN
-        r'get\s+(\w+)\s+for\s+(\d*\.?\d+)\s+(\w+)'   # Special case: get TOKEN for AMOUNT TOKEN
-    ]
-    
-    query_lower = query.lower()
-    print(f"Checking query: '{query_lower}'")
-    
-    for i, pattern in enumerate(swap_patterns):
-        print(f"Testing pattern {i+1}: {pattern}")
-        match = re.search(pattern, query_lower)
-        if match:
-            print(f"Pattern {i+1} matched! Groups: {match.groups()}")
-            try:
-                # Handle different patterns that have different group orders
-                if i == 9:  # "buy TOKEN with AMOUNT TOKEN" pattern
-                    to_token = match.group(1).upper() if match.group(1) else "UNKNOWN"
-                    amount = match.group(2) if match.group(2) else "0"
-                    from_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
-                elif i == 10:  # "get TOKEN for AMOUNT TOKEN" pattern  
-                    to_token = match.group(1).upper() if match.group(1) else "UNKNOWN"
-                    amount = match.group(2) if match.group(2) else "0"
-                    from_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
-                else:  # Standard patterns: "swap AMOUNT FROM to TO"
-                    amount = match.group(1) if match.group(1) else "0"
-                    from_token = match.group(2).upper() if match.group(2) else "UNKNOWN"
-                    to_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
-                
-                # Additional validation
-                if not amount or not from_token or not to_token:
-                    print(f"Invalid extraction: amount={amount}, from_token={from_token}, to_token={to_token}")
-                    continue
-                
-                # Normalize token symbols (handle common variations)
-                token_mappings = {
-                    'DEEP': 'DEEP',
-                    'SUI': 'SUI', 
-                    'USDC': 'USDC',
-                    'USDT': 'USDT',
-                    'BTC': 'BTC',
-                    'ETH': 'ETH',
-                    'WETH': 'WETH'
-                }
-                
-                from_token = token_mappings.get(from_token, from_token)
-                to_token = token_mappings.get(to_token, to_token)
-                    
-                swap_data = {
-                    "amount": amount,
-                    "from_token": from_token,
-                    "to_token": to_token
-                }
-                
-                response_data = {
-                    "type": "swap_intent",
-                    "swap_data": swap_data,
-                    "message": f"Ready to swap {amount} {from_token} to {to_token}. Confirm?",
-                    "assets": []
-                }
-                
-                print(f"Swap detected via regex: {swap_data}")
-                return jsonify(response_data)
-            except Exception as e:
-                print(f"Error processing match: {e}")
-                continue
-
-    # --- TAKE PROFIT / STOP LOSS DETECTION ---
-    # Check for TP/SL intents using regex with more flexible patterns
-    tp_sl_patterns = [
-        # Take Profit patterns (with optional spaces around %)
-        r'(?:create|set).*take\s*profit.*?at\s*(\d+)\s*%',
-        r'take\s*profit.*?at\s*(\d+)\s*%',
-        r'tp.*?at\s*(\d+)\s*%',
-        r'take\s*profit.*?(\d+)\s*percent',
-        r'set.*?tp.*?(\d+)\s*%',
-        # Stop Loss patterns (with optional spaces around %)
-        r'(?:create|set).*stop\s*loss.*?at\s*(\d+)\s*%',
-        r'stop\s*loss.*?at\s*(\d+)\s*%',
-        r'sl.*?at\s*(\d+)\s*%',
-        r'stop\s*loss.*?(\d+)\s*percent',
-        r'set.*?sl.*?(\d+)\s*%',
-        # More flexible patterns
-        r'(?:take\s*profit|tp).*?(\d+)\s*%.*?(?:current|price)',
-        r'(?:stop\s*loss|sl).*?(\d+)\s*%.*?(?:current|price)'
-    ]
-    
-    for i, pattern in enumerate(tp_sl_patterns):
-        print(f"Testing TP/SL pattern {i+1}: {pattern}")
-        match = re.search(pattern, query_lower)
-        if match:
-            print(f"TP/SL Pattern {i+1} matched! Groups: {match.groups()}")
-            try:
-                percentage = match.group(1)
-                
-                # Determine if it's take profit or stop loss based on keywords
-                is_take_profit = any(keyword in query_lower for keyword in ['take profit', 'tp', 'profit'])
-                is_stop_loss = any(keyword in query_lower for keyword in ['stop loss', 'sl', 'stop'])
-                
-                # Default to take profit if both or neither are detected
-                if not is_stop_loss:
-                    is_take_profit = True
-                
-                order_type = "take_profit" if is_take_profit else "stop_loss"
-                
-                tp_sl_data = {
-                    "type": order_type,
-                    "percentage": percentage,
-                    "direction": "above" if is_take_profit else "below"
-                }
-                
-                response_data = {
-                    "type": "tp_sl_intent",
-                    "tp_sl_data": tp_sl_data,
-                    "message": f"Perfect! I'll set a {'take profit' if is_take_profit else 'stop loss'} level at {percentage}% {'above' if is_take_profit else 'below'} the current market price. This will be automatically calculated using real-time price data and visualized on your trading chart. You can monitor it in the /swap page!",
-                    "assets": []
-                }
-                
-                print(f"TP/SL detected via regex: {tp_sl_data}")
-                return jsonify(response_data)
-            except Exception as e:
-                print(f"Error processing TP/SL match: {e}")
-                continue
-                continue
-
-    # --- PRICE CHECK DETECTION ---
-    # Check for price inquiry patterns
-    price_check_patterns = [
-        r'what.*current.*price.*(\w+)',
-        r'current.*price.*(\w+)',
-        r'price.*of.*(\w+)',
-        r'(\w+).*price.*now',
-        r'show.*price.*(\w+)',
-        r'get.*price.*(\w+)'
-    ]
-    
-    for i, pattern in enumerate(price_check_patterns):
-        print(f"Testing price check pattern {i+1}: {pattern}")
-        match = re.search(pattern, query_lower)
-        if match:
-            print(f"Price check pattern {i+1} matched! Groups: {match.groups()}")
-            try:
-                token = match.group(1).upper()
-                
-                response_data = {
-                    "type": "price_check",
-                    "token": token,
-                    "message": f"I'll get the current price for {token}. Check your trading chart for the most up-to-date price information!",
-                    "assets": []
-                }
-                
-                print(f"Price check detected for token: {token}")
-                return jsonify(response_data)
-            except Exception as e:
-                print(f"Error processing price check match: {e}")
-                continue
-    
-    # Determine if this needs research/assets or is just simple chat
-    router_prompt = f"""
-    Analyze user intent: "{query}"
-    
-    CLASSIFICATION CRITERIA:
-    - Respond 'LEARN': If the query contains a SUBJECT (e.g., "Space", "Sui", "React", "Cooking", "DeFi", "News"). Any question starting with "What", "How", "Why", "Tell me about", or "Chat about [topic]" MUST be 'LEARN'.
-    - Respond 'CHAT': ONLY for social filler, greetings ("Hi", "Hello"), or basic wellness checks ("How are you?").
-    
-    Decision (LEARN/CHAT):
+    messages, meta = prepare_turn(query, conversation_id, fast_llm)
+
+    # Get the response
+    try:
+        with stage("llm"):
+            result = llm.invoke(messages)
+        record_usage(llm, result)
+        output_str = result.content
+        log.debug("LLM output: %s", output_str)
+        record_reply(conversation_id, output_str)
+        with stage("parse"):
+            parsed_response = parse_llm_output(output_str)
+        parsed_response["meta"] = meta
+        remember_answer(query, output_str, parsed_response)
+        prefetch_suggestions(conversation_id, parsed_response, fast_llm)
+        return jsonify(parsed_response)
+    except Exception as e:
+        return jsonify(error_response(e))
+
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+def replay_events(conversation_id, parsed_response):
+    """Stream events for a reply that is already complete (e.g. an answer-cache hit)."""
+    for index, segment in enumerate(parsed_response.get("messages", [])):
+        yield ndjson({"event": "segment", "index": index, "data": segment})
+    if "html_response" in parsed_response:
+        yield ndjson({"event": "html_response", "data": parsed_response["html_response"]})
+    yield ndjson({"event": "suggestions", "data": parsed_response.get("suggestions", [])})
+    yield ndjson({"event": "done", "conversation_id": conversation_id, "data": parsed_response})
+
+@app.route('/chat/stream', methods=['GET'])
+def chat_stream():
     """
-    
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        # Start both Router and Web Search in parallel for ALL queries
-        # The 8B model will dynamically decide the intent without hardcoded rules
-        future_router = executor.submit(fast_llm.invoke, [HumanMessage(content=router_prompt)])
-        future_search = executor.submit(search_web, query)
-
-        # 1. Get Dynamic Router Decision
-        needs_research = True
+    Same contract as /chat, streamed as NDJSON events so the avatar can start
+    speaking the first segment while the rest is still being generated:
+    {"event": "segment", "index": i, "data": {text, facialExpression, animation, assets}}
+    {"event": "html_response" | "suggestions", "data": ...}
+    {"event": "done", "conversation_id": ..., "data": <full /chat payload>}
+    """
+    query, conversation_id, api_key, error = parse_chat_args()
+    if error:
+        return error
+    observe_query(conversation_id, query)
+
+    with stage("intent"):
+        intent = classify_intent(query)
+    if intent:
+        return Response(
+            ndjson({"event": "done", "conversation_id": conversation_id, "data": intent_response(intent)}),
+            content_type="application/x-ndjson",
+        )
+
+    try:
+        fast_llm, llm = init_llms(api_key)
+    except Exception as e:
+        return jsonify({"error": f"Invalid API Key or LLM initialization failed: {str(e)}"}), 401
+
+    cached = cached_answer(query, conversation_id)
+    if cached:
+        prefetch_suggestions(conversation_id, cached, fast_llm)
+        return Response(replay_events(conversation_id, cached), content_type="application/x-ndjson")
+
+    # Done before streaming starts so an overloaded server can still answer 503
+    messages, meta = prepare_turn(query, conversation_id, fast_llm)
+
+    def generate():
+        parser = SegmentStreamParser()
+        # The llm stage times the model alone, not the yields waiting on a slow client
+        model_seconds = 0.0
         try:
-            route_decision = future_router.result().content.strip().upper()
-            needs_research = "LEARN" in route_decision
+            chunks = iter(llm.stream(messages))
+            try:
+                while True:
+                    started = time.perf_counter()
+                    chunk = next(chunks, None)
+                    model_seconds += time.perf_counter() - started
+                    if chunk is None:
+                        break
+                    record_usage(llm, chunk)
+                    for event in parser.feed(chunk.content):
+                        if event["event"] == "segment":
+                            proxy_asset_images([event["data"]])
+                        yield ndjson(event)
+            finally:
+                metrics.record("llm", model_seconds)
         except Exception as e:
-            print(f"Router failed: {e}")
-            needs_research = True # Default to research on error
+            yield ndjson({"event": "done", "conversation_id": conversation_id, "data": error_response(e)})
+            return
 
-        # 2. Process Search Context
-        search_context = ""
-        if needs_research:
-            try:
-                search_results = future_search.result()
-                if search_results:
-                    search_context = f"\n[SEARCHED ASSETS - USE THESE REAL LINKS]:\n{json.dumps(search_results, indent=2)}\nIMPORTANT: Use the actual 'url' fields from these results."
-            except Exception as e:
-                print(f"Search failed: {e}")
-        else:
-            search_context = "\n[MODE]: CASUAL CHAT. Do NOT generate any 'assets' for this response. Keep it empty []."
-
-    if conversation_id not in conversation_history:
-        current_path = os.path.dirname(os.path.abspath(__file__))
-        path_to_try = os.path.join(current_path, "sui_tent_prompt.txt")
-        if not os.path.exists(path_to_try):
-            path_to_try = os.path.join(current_path, "web3_prompt.txt")
-            
-        with open(path_to_try, "r") as file:
-            base_context = file.read()
-            
-        # Use base context from file (Sofia/SuiTent) and append Format Instructions
-        system_prompt = base_context
-        
-        system_prompt += '''
-        IMPORTANT: SPEECH AND ANIMATION SYNCHRONIZATION
-        1. SPEECH RULE: If a segment in "messages" contains text longer than 2 words, you MUST use one of the talking animations: "Talking_0", "Talking_1", or "Talking_2". 
-        2. NON-VERBAL RULE: Only use "Laughing", "Angry", "Crying", "Terrified", or "Standing Idle" for short exclamations or emotional beats, OR if the text specifically describes a non-verbal reaction.
-        3. TEACHING TONE: When acting as "Visual Teacher", prioritize "Talking_1" (expressive) and "Talking_2" (casual) to make the explanation engaging.
-        4. VARIETY: NEVER use the same animation for two consecutive segments.
-
-        AVAILABLE ANIMATIONS (EXACT NAMES):
-        - "Talking_0", "Talking_1", "Talking_2", "Standing Idle", "Laughing", "Angry", "Crying", "Terrified", "Rumba Dancing"
-        
-        AVAILABLE FACIAL EXPRESSIONS:
-        - "default", "smile", "funnyFace", "sad", "surprised", "angry", "crazy"
-
-        CRITICAL: RESPONSE FORMAT
-        {  
-            "html_response": "<Tailwind styled chat bubble HTML>",
-            "messages": [
-                { 
-                  "text": "Check out this blog on Medium about SUI.", 
-                  "facialExpression": "smile", 
-                  "animation": "Talking_1",
-                  "assets": [
-                    { "type": "blog", "url": "https://medium.com/...", "caption": "Deep Dive into SUI" },
-                    { "type": "docs", "url": "https://docs.sui.io/...", "caption": "Official SUI Documentation" }
-                  ]
-                }
-            ],
-            "suggestions": ["...", "..."]
-        }
-        
-        RULES:
-        - ASSET CATEGORIES: Use 'youtube' for videos, 'blog' for Medium/GeeksForGeeks/Dev.to, 'docs' for official technical documentation, and 'image' for visual aids.
-        - ACTUAL LINKS ONLY: Use the real URLs provided in the [SEARCHED ASSETS] context. Do NOT make up URLs.
-        - ASSET QUOTA: You MUST prioritize a mix (e.g., 1 video + 1 blog OR 1 image + 1 docs). Provide at least 2 distinct assets.
-        - SUGGESTIONS: Provide 2-3 short, clickable questions in the "suggestions" array. Keep them under 8 words each (e.g., "Tell me more about Sui DeFi").
-        - CLEAN UI: Keep asset 'caption' field strictly between 3 to 5 words. Do NOT provide long descriptions in the caption.
-        - SEGMENTATION: Attach assets to the specific message segment they relate to. This allows them to appear while you are speaking that part.
-        - NO IDLE DURING SPEECH: If the AI is speaking text, it MUST be animating its mouth with a "Talking_" animation.
-        - EMOTION: Match facialExpression and animation to the tone of your text strictly.
-        '''
-        
-        conversation_history[conversation_id] = [
-            SystemMessage(content=system_prompt)
-        ]
-
-    # Inject market context into the current turn if available
-    input_message = query
-    if market_context:
-        input_message += market_context
-    if search_context:
-        input_message += search_context
-
-    conversation_history[conversation_id].append(HumanMessage(content=input_message))
+        output_str = parser.buffer
+        record_reply(conversation_id, output_str)
+        with stage("parse"):
+            parsed_response = parse_llm_output(output_str)
+        parsed_response["meta"] = meta
+        remember_answer(query, output_str, parsed_response)
+        prefetch_suggestions(conversation_id, parsed_response, fast_llm)
 
-    # Get the response
+        # The reply wasn't clean JSON: deliver whatever the fallback parser recovered
+        if not parser.segments:
+            for index, segment in enumerate(parsed_response.get("messages", [])):
+                yield ndjson({"event": "segment", "index": index, "data": segment})
+        if "suggestions" not in parser.fields:
+            yield ndjson({"event": "suggestions", "data": parsed_response.get("suggestions", [])})
+
+        yield ndjson({"event": "done", "conversation_id": conversation_id, "data": parsed_response})
+
+    return Response(
+        stream_with_context(generate()),
+        content_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/classify', methods=['POST'])
+def classify():
+    """
+    Bulk intent classification for chat-log replay and suggestion chips.
+    Body: {"queries": [...], "route": false, "api_key": ...}. Streams one NDJSON
+    result per query, in completion order:
+    {"event": "result", "index": i, "source": "regex" | "local" | "llm" | "llm_error" | null,
+     "intent": <the /chat swap/TP-SL/price-check payload> | null, "route": {label, confidence} | null}
+    then {"event": "done", "count": n, "sources": {...}, "llm_batches": k}.
+    With "route", queries no regex matches get the LEARN/CHAT router; the
+    uncertain ones are sent to the 8B model in batches, which needs api_key.
+    """
     try:
-        result = llm.invoke(conversation_history[conversation_id])
-        output_str = result.content
-        print(output_str)
-        conversation_history[conversation_id].append(AIMessage(content=output_str))
-        
-        # Parse and return as JSON
-        parsed_response = json.loads(output_str)
-        
-        # Ensure 'messages' exists to satisfy frontend
-        if "messages" not in parsed_response:
-            parsed_response["messages"] = [{
-                "text": output_str if isinstance(output_str, str) else "I'm sorry, I had trouble formatting that. How else can I help?",
-                "facialExpression": "default",
-                "animation": "Talking_2"
-            }]
-        if "suggestions" not in parsed_response:
-            parsed_response["suggestions"] = []
-            
-        return jsonify(parsed_response)
-    except json.JSONDecodeError:
-        # Fallback for bad JSON - try to extract JSON part
+        queries, route, api_key = parse_classify_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if route and not api_key:
+        return jsonify({"error": "Groq API Key is required to route queries."}), 401
+
+    events, batches = classify_batch(queries, route)
+    routed = iter(())
+    if batches:
         try:
-             import re
-             json_match = re.search(r'\{.*\}', output_str, re.DOTALL)
-             if json_match:
-                 parsed_match = json.loads(json_match.group(0))
-                 if "messages" not in parsed_match:
-                     parsed_match["messages"] = [{"text": output_str, "facialExpression": "default", "animation": "Talking_2"}]
-                 return jsonify(parsed_match)
-        except:
-             pass
-        # Final safety wrapper
-        return jsonify({
-            "messages": [{"text": "I'm sorry, let me try that again. What was your question?", "facialExpression": "sad", "animation": "Talking_0"}],
-            "suggestions": [],
-            "error": "JSON Parse Error",
-            "raw_response": output_str
-        })
-    except Exception as e:
-        return jsonify({
-            "messages": [{"text": f"Error: {str(e)}", "facialExpression": "sad", "animation": "Talking_0"}],
-            "suggestions": []
-        })
+            fast_llm, _ = init_llms(api_key)
+        except Exception as e:
+            return jsonify({"error": f"Invalid API Key or LLM initialization failed: {str(e)}"}), 401
+        # First calls are submitted before streaming starts so a full pool is still a 503
+        routed = start_batch_routing(fast_llm, batches)
+
+    def generate():
+        counts = Counter()
+        try:
+            for event in events:
+                counts[event["source"]] += 1
+                yield ndjson(event)
+            for batch, decisions in routed:
+                for event in route_batch_events(batch, decisions):
+                    counts[event["source"]] += 1
+                    yield ndjson(event)
+            yield ndjson(classify_done(counts, batches))
+        finally:
+            # Runs when Flask closes the response on a disconnect: cancels routing still in flight
+            if batches:
+                routed.close()
+
+    return Response(
+        stream_with_context(generate()),
+        content_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0", port=5001)
@@ -0,0 +1,400 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import executors
+import upstream
+from executors import Saturated
+from image import CACHE_CONTROL as IMAGE_CACHE_CONTROL, DEFAULT_SIZE, ImageUnavailable
+from intents import classify_intent, intent_response
+from pipeline import (
+    conversation_history, llm_pool, answer_cache, init_llms, prepare_turn_async, parse_llm_output,
+    error_response, quote_data, quote_batch, cached_answer, remember_answer, record_reply,
+    trigger_engine, register_order, prefetcher, observe_query, prefetch_suggestions,
+    image_proxy, parse_classify_body, classify_batch, classify_done, route_batches_async, route_batch_events,
+)
+from tools import SEARCHERS, price_cache
+import metrics
+from metrics import stage, record_usage
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+log = logging.getLogger(__name__)
+
+# Async serving mode: the same /chat and /quote contracts as app.py, served on
+# one event loop so a slow chat holds a coroutine instead of a worker thread.
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5001
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, DELETE, OPTIONS"),
+    (b"access-control-expose-headers", b"Server-Timing"),
+]
+
+
+class ChatASGI:
+    """
+    Minimal ASGI application for the agentic backend.
+
+    At most `max_concurrency` requests are handled at once; beyond that, and
+    while shutting down, requests get an immediate 503. On lifespan shutdown it
+    waits up to `shutdown_timeout` seconds for in-flight requests to finish.
+    Blocking calls made with asyncio.to_thread run on a pool of `threads`
+    (default `max_concurrency`) installed as the loop's default executor.
+    """
+
+    def __init__(self, max_concurrency=1000, shutdown_timeout=30, threads=None):
+        self.max_concurrency = max_concurrency
+        self.shutdown_timeout = shutdown_timeout
+        self.threads = threads or max_concurrency
+        self.active = 0
+        self.draining = False
+        self._idle = None
+        self.routes = {
+            ("GET", "/chat"): self.chat,
+            ("GET", "/quote"): self.quote,
+            ("POST", "/quotes"): self.quotes,
+            ("POST", "/orders"): self.create_order,
+            ("DELETE", "/orders"): self.cancel_order,
+            ("GET", "/orders/events"): self.order_events,
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.prometheus_metrics,
+            ("GET", "/image"): self.image_thumbnail,
+            ("POST", "/classify"): self.classify,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] == "OPTIONS":
+            await send_response(send, 204, b"", b"text/plain")
+            return
+
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            await send_json(send, 404, {"error": "Not found"})
+            return
+
+        if self.draining or self.active >= self.max_concurrency:
+            await send_json(send, 503, {"error": "Server is busy, please retry shortly."}, [(b"retry-after", b"1")])
+            return
+
+        self.active += 1
+        self.idle_event().clear()
+        timings = metrics.start_request()
+        status = []
+
+        async def send_tracked(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+
+        try:
+            params = {k: v[0] for k, v in parse_qs(scope["query_string"].decode()).items()}
+            await handler(params, receive, send_tracked)
+        except Saturated as e:
+            log.warning("Rejecting request: %s", e)
+            await send_json(send_tracked, 503, {"error": "Server is busy, please retry shortly."}, [(b"retry-after", b"1")])
+        finally:
+            metrics.REQUEST_SECONDS.observe(timings.elapsed(), scope["path"], status[0] if status else 500)
+            self.active -= 1
+            if self.active == 0:
+                self._idle.set()
+
+    def idle_event(self):
+        """
+        Set while no request is in flight. Created on first use, inside the
+        server's event loop: servers without lifespan support never send startup.
+        """
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+            # The stock default executor has ~32 threads for every to_thread call in the process
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi")
+            )
+        return self._idle
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.idle_event()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Stop accepting work, then give in-flight chats time to finish
+                self.draining = True
+                try:
+                    await asyncio.wait_for(self.idle_event().wait(), timeout=self.shutdown_timeout)
+                except asyncio.TimeoutError:
+                    log.warning("Shutdown timed out with %d requests in flight", self.active)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- routes ---
+
+    async def quote(self, params, receive, send):
+        token_in = params.get('token_in')
+        token_out = params.get('token_out')
+        amount_in = params.get('amount_in')
+
+        if not all([token_in, token_out, amount_in]):
+            await send_json(send, 400, {"error": "Missing required parameters: token_in, token_out, amount_in"})
+            return
+
+        try:
+            await send_json(send, 200, quote_data(token_in, token_out, amount_in))
+        except ValueError as e:
+            await send_json(send, 400, {"error": str(e)})
+        except Exception as e:
+            await send_json(send, 500, {"error": f"Quote calculation failed: {str(e)}"})
+
+    async def quotes(self, params, receive, send):
+        body = await read_json(receive)
+        try:
+            await send_json(send, 200, quote_batch(body))
+        except ValueError as e:
+            await send_json(send, 400, {"error": str(e)})
+
+    async def create_order(self, params, receive, send):
+        body = await read_json(receive)
+        try:
+            # Without a reference_price this fetches the current price from CoinGecko
+            order = await asyncio.to_thread(register_order, body)
+        except ValueError as e:
+            await send_json(send, 400, {"error": str(e)})
+            return
+        await send_json(send, 201, order)
+
+    async def cancel_order(self, params, receive, send):
+        try:
+            order_id = int(params['order_id'])
+        except (KeyError, ValueError):
+            order_id = None
+        owner = params.get('owner')
+        if order_id is None or not owner:
+            await send_json(send, 400, {"error": "Missing required parameters: order_id, owner"})
+            return
+        await send_json(send, 200, {"cancelled": trigger_engine.cancel(order_id, owner)})
+
+    async def order_events(self, params, receive, send):
+        try:
+            since = int(params.get('since', 0))
+            limit = int(params.get('limit', 100))
+        except ValueError:
+            since, limit = 0, 100
+        await send_json(send, 200, {"events": trigger_engine.events(since, limit), "last_seq": trigger_engine.stats()["last_seq"]})
+
+    async def prometheus_metrics(self, params, receive, send):
+        await send_response(send, 200, metrics.registry.render().encode(), metrics.PROMETHEUS_CONTENT_TYPE.encode())
+
+    async def image_thumbnail(self, params, receive, send):
+        url = params.get('url')
+        if not url:
+            await send_json(send, 400, {"error": "Missing required parameter: url"})
+            return
+        if not image_proxy.verify(url, params.get('sig')):
+            await send_json(send, 403, {"error": "Image URL is not signed by this server"})
+            return
+
+        size = params.get('size', DEFAULT_SIZE)
+        try:
+            # The store reads its SQLite index and the blob from disk
+            hit = await asyncio.to_thread(image_proxy.lookup, url, size)
+            if hit is None:
+                # Shielded: other requests may be waiting on the same render
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(image_proxy.submit(url))), 15)
+                hit = await asyncio.to_thread(image_proxy.lookup, url, size)
+                if hit is None:
+                    raise ImageUnavailable("Rendered image was evicted before it could be served")
+        except ValueError as e:
+            await send_json(send, 400, {"error": str(e)})
+            return
+        except Saturated:
+            raise
+        except Exception as e:
+            await send_json(send, 502, {"error": f"Image unavailable: {str(e)}"})
+            return
+
+        digest, content_type, data = hit
+        await send_response(send, 200, data, content_type.encode(), [
+            (b"cache-control", IMAGE_CACHE_CONTROL.encode()),
+            (b"etag", f'"{digest}"'.encode()),
+        ])
+
+    async def classify(self, params, receive, send):
+        """Same contract as app.py's /classify: NDJSON results, then a done event."""
+        try:
+            queries, route, api_key = parse_classify_body(await read_json(receive))
+        except ValueError as e:
+            await send_json(send, 400, {"error": str(e)})
+            return
+        if route and not api_key:
+            await send_json(send, 401, {"error": "Groq API Key is required to route queries."})
+            return
+
+        # Thousands of regex passes are a few milliseconds of CPU; keep them off the loop too
+        events, batches = await asyncio.to_thread(classify_batch, queries, route)
+        fast_llm = None
+        if batches:
+            try:
+                fast_llm, _ = await asyncio.to_thread(init_llms, api_key)
+            except Exception as e:
+                await send_json(send, 401, {"error": f"Invalid API Key or LLM initialization failed: {str(e)}"})
+                return
+
+        counts = Counter()
+        await start_stream(send, b"application/x-ndjson")
+        for event in events:
+            counts[event["source"]] += 1
+        # The in-process results go out together; routed ones as each batch finishes
+        await send_chunk(send, "".join(ndjson(event) for event in events).encode())
+        if batches:
+            async for batch, decisions in route_batches_async(fast_llm, batches):
+                routed = route_batch_events(batch, decisions)
+                counts.update(event["source"] for event in routed)
+                await send_chunk(send, "".join(ndjson(event) for event in routed).encode())
+        await send_chunk(send, ndjson(classify_done(counts, batches)).encode(), more_body=False)
+
+    async def health(self, params, receive, send):
+        await send_json(send, 200, await asyncio.to_thread(self.health_stats))
+
+    def health_stats(self):
+        # Run in a thread: the SQLite-backed stores count their rows
+        return {
+            "status": "ok",
+            "active_requests": self.active,
+            "llm_pool": llm_pool.stats(),
+            "conversations": conversation_history.stats(),
+            "price_cache": price_cache.stats(),
+            "executors": executors.stats(),
+            "upstreams": upstream.stats(),
+            "answer_cache": answer_cache.stats() if answer_cache else None,
+            "orders": trigger_engine.stats(),
+            "prefetch": prefetcher.stats() if prefetcher else None,
+            "images": image_proxy.stats()
+        }
+
+    async def chat(self, params, receive, send):
+        query = params.get('query')
+        conversation_id = params.get('conversation_id') or str(uuid.uuid4())
+        api_key = params.get('api_key')
+
+        if not query:
+            await send_response(send, 400, b"Error: Query parameter is required", b"text/plain")
+            return
+        if not api_key:
+            await send_response(send, 401, b"Error: Groq API Key is required. Please set it in the settings.", b"text/plain")
+            return
+        observe_query(conversation_id, query)
+
+        # Regex intents are answered before any LLM client (and LangChain) is loaded
+        with stage("intent"):
+            intent = classify_intent(query)
+        if intent:
+            await send_json(send, 200, intent_response(intent))
+            return
+
+        try:
+            # The first call imports langchain_groq
+            fast_llm, llm = await asyncio.to_thread(init_llms, api_key)
+        except Exception as e:
+            await send_json(send, 401, {"error": f"Invalid API Key or LLM initialization failed: {str(e)}"})
+            return
+
+        # Answer cache and conversation store (SQLite when shared) are blocking: run them off the loop
+        cached = await asyncio.to_thread(cached_answer, query, conversation_id)
+        if cached:
+            await send_json(send, 200, cached)
+            prefetch_suggestions(conversation_id, cached, fast_llm)
+            return
+
+        messages, meta = await prepare_turn_async(query, conversation_id, fast_llm)
+
+        try:
+            with stage("llm"):
+                result = await llm.ainvoke(messages)
+            record_usage(llm, result)
+            output_str = result.content
+            await asyncio.to_thread(record_reply, conversation_id, output_str)
+            with stage("parse"):
+                parsed_response = parse_llm_output(output_str)
+            parsed_response["meta"] = meta
+            await asyncio.to_thread(remember_answer, query, output_str, parsed_response)
+            prefetch_suggestions(conversation_id, parsed_response, fast_llm)
+            await send_json(send, 200, parsed_response)
+        except Exception as e:
+            await send_json(send, 200, error_response(e))
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def read_json(receive):
+    """Request body as JSON, or None if it is empty or malformed."""
+    try:
+        return json.loads(await read_body(receive) or b"null")
+    except ValueError:
+        return None
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())] + CORS_HEADERS + list(headers)
+    timings = metrics.current_timings()
+    if timings is not None and timings.stages:
+        headers.append((b"server-timing", timings.header().encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload, headers=()):
+    await send_response(send, status, json.dumps(payload).encode(), b"application/json", headers)
+
+
+async def start_stream(send, content_type, headers=()):
+    """Start a 200 response whose body follows in send_chunk() calls."""
+    headers = [(b"content-type", content_type), (b"cache-control", b"no-cache")] + CORS_HEADERS + list(headers)
+    timings = metrics.current_timings()
+    if timings is not None and timings.stages:
+        headers.append((b"server-timing", timings.header().encode()))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+
+async def send_chunk(send, body, more_body=True):
+    await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+
+app = ChatASGI(
+    max_concurrency=int(os.environ.get("ASGI_MAX_CONCURRENCY", 1000)),
+    shutdown_timeout=float(os.environ.get("ASGI_SHUTDOWN_TIMEOUT", 30)),
+)
+# Every admitted request may be an uncached LEARN turn holding one search slot
+# per category: size the search queue so those wait for a worker instead of a 503
+executors.search.max_queue = max(executors.search.max_queue, len(SEARCHERS) * app.max_concurrency)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5001)
@@ -0,0 +1,82 @@
+import json
+from collections import namedtuple
+
+from conversation_store import estimate_tokens
+
+# text: what gets appended to the current user turn
+# tokens: its estimated size; legacy_tokens: size of the old pretty-printed form
+TurnContext = namedtuple("TurnContext", ["text", "tokens", "legacy_tokens"])
+
+CASUAL_MODE = "\n[MODE]: CASUAL CHAT. Do NOT generate any 'assets' for this response. Keep it empty []."
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def trim_search_results(results, token_budget, snippet_chars=240):
+    """
+    Deduplicate search hits by URL, shorten snippets and drop the tail of the
+    largest category until the serialized results fit in `token_budget`.
+    """
+    seen = set()
+    trimmed = {}
+    for category, items in results.items():
+        kept = []
+        for item in items or []:
+            url = item.get("url")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            item = {k: v for k, v in item.items() if v}
+            snippet = item.get("snippet")
+            if snippet and len(snippet) > snippet_chars:
+                item["snippet"] = snippet[:snippet_chars].rstrip() + "..."
+            kept.append(item)
+        if kept:
+            trimmed[category] = kept
+
+    while trimmed and estimate_tokens(compact_json(trimmed)) > token_budget:
+        category = max(trimmed, key=lambda c: len(trimmed[c]))
+        trimmed[category].pop()
+        if not trimmed[category]:
+            del trimmed[category]
+    return trimmed
+
+
+def market_data_label(age):
+    """Prompt header for price data fetched `age` seconds ago."""
+    if age is None or age < 60:
+        return "[REAL-TIME MARKET DATA]"
+    return f"[MARKET DATA FROM {int(age // 60)} MIN AGO]"
+
+
+def build_turn_context(prices=None, search_results=None, casual=False, token_budget=1200, prices_age=None):
+    """
+    Assemble the tool data for the current turn only. It is appended to the
+    message sent to the model but never stored in the conversation history.
+    `prices_age` is how old `prices` is, in seconds; older data is labelled so.
+    """
+    text = ""
+    legacy = ""
+
+    if prices:
+        text += f"\n{market_data_label(prices_age)}: {compact_json(prices)}\nUse this data to answer questions about current prices."
+        if prices_age is not None and prices_age >= 60:
+            text += " Tell the user how old it is."
+        legacy += f"\n[REAL-TIME MARKET DATA]: {json.dumps(prices, indent=2)}\nUse this data to answer questions about current prices."
+
+    if casual:
+        text += CASUAL_MODE
+        legacy += CASUAL_MODE
+    elif search_results:
+        trimmed = trim_search_results(search_results, token_budget)
+        if trimmed:
+            text += f"\n[SEARCHED ASSETS - USE THESE REAL LINKS]:\n{compact_json(trimmed)}\nIMPORTANT: Use the actual 'url' fields from these results."
+        legacy += f"\n[SEARCHED ASSETS - USE THESE REAL LINKS]:\n{json.dumps(search_results, indent=2)}\nIMPORTANT: Use the actual 'url' fields from these results."
+
+    return TurnContext(
+        text,
+        estimate_tokens(text) if text else 0,
+        estimate_tokens(legacy) if legacy else 0,
+    )
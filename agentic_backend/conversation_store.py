@@ -0,0 +1,515 @@
+import abc
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_usage
+
+log = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English/JSON)."""
+    return len(text) // 4 + 1
+
+
+def window_cut(turns, total, budget):
+    """
+    How many of the oldest `turns` ([(message, tokens, ...)], `total` tokens)
+    to window out so the rest fit in `budget`. Returns (cut, remaining tokens).
+    """
+    cut = 0
+    # Always keep the latest turn, even if it alone exceeds the budget
+    while total > budget and cut < len(turns) - 1:
+        total -= turns[cut][1]
+        cut += 1
+    # Never start the window on a reply without the question it answers
+    while cut < len(turns) - 1 and turns[cut][0].type == "ai":
+        total -= turns[cut][1]
+        cut += 1
+    return cut, total
+
+
+# langchain_core is imported on first use, so paths that never touch a
+# conversation (quotes, regex intents) don't load it
+
+def system_message(content):
+    from langchain_core.messages import SystemMessage
+    return SystemMessage(content=content)
+
+
+def summary_message(summary):
+    return system_message(f"Summary of the earlier conversation: {summary}")
+
+
+def stored_message(role, content):
+    """Rebuild a turn from its stored role (LangChain's message.type)."""
+    from langchain_core.messages import AIMessage, HumanMessage
+    return (AIMessage if role == "ai" else HumanMessage)(content=content)
+
+
+class BaseConversationStore(abc.ABC):
+    """
+    Interface shared by the conversation backends.
+
+    Each conversation keeps at most `token_budget` tokens of turns. Older
+    turns are windowed out and, when a compactor is supplied, folded into a
+    running summary on `executor` (a private single thread if None).
+    Conversations idle for longer than `idle_ttl` seconds are dropped.
+    """
+
+    backend = None
+
+    def __init__(self, idle_ttl=6 * 3600, token_budget=4000, executor=None):
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-compactor")
+        self._counters = {"evicted_idle": 0, "windowed_turns": 0, "compactions": 0, "compaction_errors": 0}
+
+    @abc.abstractmethod
+    def __contains__(self, conversation_id):
+        """True if the conversation exists and has not expired."""
+
+    @abc.abstractmethod
+    def start(self, conversation_id, system_prompt):
+        """Begin a conversation unless it already exists. Returns True if this call created it."""
+
+    @abc.abstractmethod
+    def append(self, conversation_id, message, context_tokens=0):
+        """Add a turn, noting `context_tokens` of tool data sent with it but not stored."""
+
+    @abc.abstractmethod
+    def window(self, conversation_id, compactor=None):
+        """The messages to send to the model, [] if the conversation is gone."""
+
+    @abc.abstractmethod
+    def context_tokens(self, conversation_id):
+        """Ephemeral context tokens attached to the turns currently in the window."""
+
+    @abc.abstractmethod
+    def stats(self):
+        """Counters and sizes for /health."""
+
+    def _budget(self, summary):
+        return self.token_budget - (estimate_tokens(summary) if summary else 0)
+
+    def _schedule_compaction(self, conversation_id, handle, summary, turns, compactor):
+        # Caller holds self._lock
+        try:
+            self.executor.submit(self._compact, conversation_id, handle, summary, turns, compactor)
+        except Exception as e:
+            # Pool saturated: the turns are simply dropped without a summary
+            log.warning("Conversation compaction not scheduled for %s: %s", conversation_id, e)
+            self._counters["compaction_errors"] += 1
+
+    def _compact(self, conversation_id, handle, summary, turns, compactor):
+        try:
+            new_summary = compactor(summary, turns)
+        except Exception as e:
+            log.warning("Conversation compaction failed for %s: %s", conversation_id, e)
+            with self._lock:
+                self._counters["compaction_errors"] += 1
+            return
+        with self._lock:
+            self._store_summary(conversation_id, handle, summary, new_summary)
+            self._counters["compactions"] += 1
+
+    @abc.abstractmethod
+    def _store_summary(self, conversation_id, handle, old_summary, new_summary):
+        """Save `new_summary` for the conversation `handle` refers to, if it is still current. Caller holds self._lock."""
+
+
+class _Conversation:
+    __slots__ = ("system", "summary", "turns", "tokens", "size", "last_used")
+
+    def __init__(self, system):
+        self.system = system
+        self.summary = ""
+        self.turns = []  # [(message, tokens, context_tokens)]
+        self.tokens = 0
+        self.size = 0
+        self.last_used = time.monotonic()
+
+
+class ConversationStore(BaseConversationStore):
+    """
+    Bounded in-memory conversation history, private to this process.
+
+    - System prompts are interned, so conversations share one SystemMessage.
+    - The store as a whole is capped at `max_bytes` of message text; least
+      recently used conversations are evicted first.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, idle_ttl=6 * 3600, token_budget=4000, executor=None):
+        super().__init__(idle_ttl=idle_ttl, token_budget=token_budget, executor=executor)
+        self.max_bytes = max_bytes
+        self._conversations = OrderedDict()
+        self._prompts = {}
+        self._size = 0
+        self._counters["evicted_lru"] = 0
+
+    def __contains__(self, conversation_id):
+        with self._lock:
+            return conversation_id in self._conversations
+
+    def start(self, conversation_id, system_prompt):
+        """Begin a conversation unless it already exists. Returns True if this call created it."""
+        with self._lock:
+            if conversation_id in self._conversations:
+                return False
+            system = self._prompts.get(system_prompt)
+            if system is None:
+                system = self._prompts[system_prompt] = system_message(system_prompt)
+            self._conversations[conversation_id] = _Conversation(system)
+            self._evict()
+            return True
+
+    def append(self, conversation_id, message, context_tokens=0):
+        """
+        Add a turn. `context_tokens` records how much ephemeral tool data was
+        sent alongside it without being stored, for savings accounting.
+        """
+        tokens = estimate_tokens(message.content)
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return
+            conversation.turns.append((message, tokens, context_tokens))
+            conversation.tokens += tokens
+            conversation.size += len(message.content)
+            self._size += len(message.content)
+            self._touch(conversation_id, conversation)
+            self._evict()
+
+    def window(self, conversation_id, compactor=None):
+        """
+        Messages to send to the model: the system prompt, the running summary
+        and the most recent turns that fit in the token budget.
+
+        `compactor(summary, turns) -> str` summarizes the turns that no longer fit.
+        """
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return []
+            self._touch(conversation_id, conversation)
+
+            evicted = self._trim(conversation)
+            if evicted and compactor is not None:
+                self._schedule_compaction(
+                    conversation_id, conversation, conversation.summary, [t[0] for t in evicted], compactor
+                )
+
+            messages = [conversation.system]
+            if conversation.summary:
+                messages.append(summary_message(conversation.summary))
+            messages.extend(t[0] for t in conversation.turns)
+            return messages
+
+    def context_tokens(self, conversation_id):
+        """Ephemeral context tokens attached to the turns currently in the window."""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            return sum(t[2] for t in conversation.turns) if conversation else 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["backend"] = self.backend
+            stats["conversations"] = len(self._conversations)
+            stats["bytes"] = self._size
+            stats["system_prompts"] = len(self._prompts)
+        return stats
+
+    # --- internals (caller holds self._lock) ---
+
+    def _touch(self, conversation_id, conversation):
+        conversation.last_used = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+
+    def _drop(self, conversation_id):
+        conversation = self._conversations.pop(conversation_id)
+        self._size -= conversation.size
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_used > self.idle_ttl:
+                self._drop(oldest_id)
+                self._counters["evicted_idle"] += 1
+            elif self._size > self.max_bytes and len(self._conversations) > 1:
+                self._drop(oldest_id)
+                self._counters["evicted_lru"] += 1
+            else:
+                break
+
+    def _trim(self, conversation):
+        """Window out the oldest turns until the conversation fits its budget."""
+        turns = conversation.turns
+        cut, total = window_cut(turns, conversation.tokens, self._budget(conversation.summary))
+        if not cut:
+            return []
+
+        evicted = turns[:cut]
+        conversation.turns = turns[cut:]
+        conversation.tokens = total
+        freed = sum(len(t[0].content) for t in evicted)
+        conversation.size -= freed
+        self._size -= freed
+        self._counters["windowed_turns"] += cut
+        return evicted
+
+    def _store_summary(self, conversation_id, conversation, old_summary, new_summary):
+        # The conversation may have been evicted while we were summarizing
+        if self._conversations.get(conversation_id) is conversation:
+            delta = len(new_summary) - len(conversation.summary)
+            conversation.summary = new_summary
+            conversation.size += delta
+            self._size += delta
+
+
+class SQLiteConversationStore(BaseConversationStore):
+    """
+    Conversation history in an append-only SQLite (WAL) database, so every
+    worker process on a host sees the same conversations.
+
+    - Turns are inserted one row at a time; nothing is re-serialized.
+    - System prompts are stored once in `prompts` and referenced by id.
+    - Windowing only moves a conversation's `window_start` pointer; the rows
+      it passes over, and conversations idle past `idle_ttl`, are deleted by
+      purge(), which runs every `purge_interval` seconds.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path, idle_ttl=6 * 3600, token_budget=4000, executor=None, purge_interval=300):
+        super().__init__(idle_ttl=idle_ttl, token_budget=token_budget, executor=executor)
+        self.path = path
+        self.purge_interval = purge_interval
+        self._db = None
+        self._prompt_ids = {}  # prompt text -> id
+        self._prompts = {}     # id -> shared SystemMessage
+        self._last_purge = time.time()
+
+    def __contains__(self, conversation_id):
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT last_used FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.idle_ttl
+
+    def start(self, conversation_id, system_prompt):
+        """Begin a conversation unless a live one exists. Returns True if this call created it."""
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            prompt_id = self._prompt_id(db, system_prompt)
+            # One statement decides, so two processes starting the same id can't both win;
+            # a row idle past idle_ttl is restarted as if it were absent
+            created = db.execute(
+                "INSERT INTO conversations (id, prompt_id, summary, window_start, started, last_used) "
+                "VALUES (?, ?, '', 0, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET prompt_id = excluded.prompt_id, summary = '', window_start = 0, "
+                "started = excluded.started, last_used = excluded.last_used WHERE conversations.last_used < ?",
+                (conversation_id, prompt_id, now, now, now - self.idle_ttl),
+            ).rowcount > 0
+            if created:
+                db.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            db.commit()
+            if now - self._last_purge > self.purge_interval:
+                self._purge(db, now)
+        return created
+
+    def append(self, conversation_id, message, context_tokens=0):
+        """
+        Add a turn. `context_tokens` records how much ephemeral tool data was
+        sent alongside it without being stored, for savings accounting.
+        """
+        with self._lock:
+            db = self._conn()
+            # The UPDATE takes the write lock, so the seq below can't race another process
+            updated = db.execute(
+                "UPDATE conversations SET last_used = ? WHERE id = ?", (time.time(), conversation_id)
+            ).rowcount
+            if updated:
+                db.execute(
+                    "INSERT INTO turns (conversation_id, seq, role, content, tokens, context_tokens) "
+                    "SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ?, ?, ? FROM turns WHERE conversation_id = ?",
+                    (conversation_id, message.type, message.content, estimate_tokens(message.content),
+                     context_tokens, conversation_id),
+                )
+            db.commit()
+
+    def window(self, conversation_id, compactor=None):
+        """
+        Messages to send to the model: the system prompt, the running summary
+        and the most recent turns that fit in the token budget.
+
+        `compactor(summary, turns) -> str` summarizes the turns that no longer fit.
+        """
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT prompt_id, summary, window_start, started FROM conversations WHERE id = ?",
+                (conversation_id,),
+            ).fetchone()
+            if row is None:
+                return []
+            prompt_id, summary, window_start, started = row
+            turns = [
+                (stored_message(role, content), tokens, seq)
+                for seq, role, content, tokens in db.execute(
+                    "SELECT seq, role, content, tokens FROM turns "
+                    "WHERE conversation_id = ? AND seq >= ? ORDER BY seq",
+                    (conversation_id, window_start),
+                )
+            ]
+
+            cut, _ = window_cut(turns, sum(t[1] for t in turns), self._budget(summary))
+            db.execute(
+                "UPDATE conversations SET last_used = ?, window_start = ? WHERE id = ?",
+                (time.time(), turns[cut][2] if cut else window_start, conversation_id),
+            )
+            db.commit()
+            if cut:
+                self._counters["windowed_turns"] += cut
+                if compactor is not None:
+                    self._schedule_compaction(
+                        conversation_id, started, summary, [t[0] for t in turns[:cut]], compactor
+                    )
+
+            messages = [self._system(db, prompt_id)]
+            if summary:
+                messages.append(summary_message(summary))
+            messages.extend(t[0] for t in turns[cut:])
+            return messages
+
+    def context_tokens(self, conversation_id):
+        """Ephemeral context tokens attached to the turns currently in the window."""
+        with self._lock:
+            return self._conn().execute(
+                "SELECT COALESCE(SUM(t.context_tokens), 0) FROM turns t "
+                "JOIN conversations c ON c.id = t.conversation_id "
+                "WHERE t.conversation_id = ? AND t.seq >= c.window_start",
+                (conversation_id,),
+            ).fetchone()[0]
+
+    def purge(self):
+        """Delete idle conversations and windowed-out turns. Returns conversations removed."""
+        with self._lock:
+            return self._purge(self._conn(), time.time())
+
+    def stats(self):
+        with self._lock:
+            db = self._conn()
+            stats = dict(self._counters)
+            stats["backend"] = self.backend
+            stats["path"] = self.path
+            stats["conversations"] = db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            stats["turns"] = db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+            stats["system_prompts"] = db.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        return stats
+
+    # --- internals (caller holds self._lock) ---
+
+    def _conn(self):
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: durable across process crashes, fsync only at checkpoints
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS prompts ("
+                "id INTEGER PRIMARY KEY, hash TEXT UNIQUE, content TEXT)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, prompt_id INTEGER, summary TEXT, window_start INTEGER, "
+                "started REAL, last_used REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS conversations_last_used ON conversations (last_used)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "conversation_id TEXT, seq INTEGER, role TEXT, content TEXT, tokens INTEGER, "
+                "context_tokens INTEGER, PRIMARY KEY (conversation_id, seq)) WITHOUT ROWID"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _prompt_id(self, db, system_prompt):
+        prompt_id = self._prompt_ids.get(system_prompt)
+        if prompt_id is None:
+            digest = hashlib.sha256(system_prompt.encode()).hexdigest()
+            db.execute("INSERT OR IGNORE INTO prompts (hash, content) VALUES (?, ?)", (digest, system_prompt))
+            prompt_id = db.execute("SELECT id FROM prompts WHERE hash = ?", (digest,)).fetchone()[0]
+            self._prompt_ids[system_prompt] = prompt_id
+            self._prompts[prompt_id] = system_message(system_prompt)
+        return prompt_id
+
+    def _system(self, db, prompt_id):
+        system = self._prompts.get(prompt_id)
+        if system is None:
+            # Written by another process
+            content = db.execute("SELECT content FROM prompts WHERE id = ?", (prompt_id,)).fetchone()[0]
+            system = self._prompts[prompt_id] = system_message(content)
+            self._prompt_ids[content] = prompt_id
+        return system
+
+    def _purge(self, db, now):
+        self._last_purge = now
+        cutoff = now - self.idle_ttl
+        db.execute(
+            "DELETE FROM turns WHERE conversation_id IN (SELECT id FROM conversations WHERE last_used < ?)",
+            (cutoff,),
+        )
+        removed = db.execute("DELETE FROM conversations WHERE last_used < ?", (cutoff,)).rowcount
+        db.execute(
+            "DELETE FROM turns WHERE seq < "
+            "(SELECT window_start FROM conversations c WHERE c.id = turns.conversation_id)"
+        )
+        db.commit()
+        self._counters["evicted_idle"] += removed
+        return removed
+
+    def _store_summary(self, conversation_id, started, old_summary, new_summary):
+        # Skip if the conversation was restarted, or another process summarized it first
+        db = self._conn()
+        db.execute(
+            "UPDATE conversations SET summary = ? WHERE id = ? AND started = ? AND summary = ?",
+            (new_summary, conversation_id, started, old_summary),
+        )
+        db.commit()
+
+
+def default_db_path():
+    # Shared by every worker process on the host; /tmp is writable on serverless hosts too
+    return os.environ.get("CONVERSATION_DB", os.path.join(tempfile.gettempdir(), "suitent_conversations.sqlite3"))
+
+
+def llm_compactor(llm, max_words=120):
+    """Build a compactor that summarizes evicted turns with a (fast) chat model."""
+    def compact(summary, turns):
+        from langchain_core.messages import HumanMessage
+        transcript = "\n".join(
+            f"{'User' if m.type == 'human' else 'Assistant'}: {m.content}" for m in turns
+        )
+        prompt = (
+            f"Update the running summary of a conversation in at most {max_words} words. "
+            "Keep names, tokens, amounts and decisions; drop pleasantries and URLs.\n\n"
+            f"Current summary: {summary or '(none)'}\n\nNew turns:\n{transcript}\n\nUpdated summary:"
+        )
+        result = llm.invoke([HumanMessage(content=prompt)])
+        record_usage(llm, result)
+        return result.content.strip()
+    return compact
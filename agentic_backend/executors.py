@@ -0,0 +1,115 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Saturated(Exception):
+    """Raised when a pool's queue is full; callers should shed load (HTTP 503)."""
+
+
+class BoundedExecutor:
+    """
+    Long-lived, named thread pool with a cap on queued work.
+
+    At most `max_workers` tasks run and `max_queue` more may wait; beyond that
+    submit() raises Saturated immediately instead of letting work pile up.
+    `max_queue` may be raised at runtime. Time spent waiting in the queue is
+    recorded per pool.
+    """
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._started = 0
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._counters["rejected"] += 1
+                raise Saturated(f"{self.name} pool is saturated")
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+
+        enqueued = time.monotonic()
+        # Run in the submitter's context so per-request state (e.g. metrics timings) follows the task
+        context = contextvars.copy_context()
+
+        def run():
+            waited = time.monotonic() - enqueued
+            with self._lock:
+                self._running += 1
+                self._started += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # Also fires for futures cancelled before they ran, so slots never leak
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._counters["completed"] += 1
+
+    def queued(self):
+        """Tasks accepted but not yet running."""
+        with self._lock:
+            return self._in_flight - self._running
+
+    def stats(self):
+        with self._lock:
+            started = self._started
+            stats = dict(self._counters)
+            stats.update({
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "avg_queue_wait_ms": round(self._wait_total / started * 1000, 3) if started else 0.0,
+                "max_queue_wait_ms": round(self._wait_max * 1000, 3),
+            })
+        return stats
+
+
+def _pool(name, workers, queue):
+    prefix = name.upper()
+    return BoundedExecutor(
+        name,
+        max_workers=int(os.environ.get(f"{prefix}_POOL_WORKERS", workers)),
+        max_queue=int(os.environ.get(f"{prefix}_POOL_QUEUE", queue)),
+    )
+
+
+# Process-wide pools shared by every request
+llm = _pool("llm", 16, 64)
+search = _pool("search", 32, 128)
+prices = _pool("prices", 4, 16)
+# Background work that must never delay live requests (suggestion prefetch)
+prefetch = _pool("prefetch", 4, 32)
+# CPU-bound image decoding/resizing, kept off the pools chat requests use
+images = _pool("images", 4, 64)
+
+
+def stats():
+    return {pool.name: pool.stats() for pool in (llm, search, prices, prefetch, images)}
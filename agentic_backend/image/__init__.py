@@ -0,0 +1,4 @@
+# Asset image proxy: fetch once, downscale to card sizes, serve from a disk cache
+from image.proxy import CACHE_CONTROL, ImageProxy, ImageUnavailable, fetch_url, local_fetcher
+from image.samplr import CARD_SIZES, DEFAULT_SIZE
+from image.store import ImageStore, default_image_dir
@@ -0,0 +1,203 @@
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from image.samplr import CARD_SIZES, render_sizes
+
+log = logging.getLogger(__name__)
+
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+MAX_FAILED_URLS = 4096
+# A URL's rendering only changes if it is evicted and the source has changed since
+CACHE_CONTROL = "public, max-age=604800, immutable"
+
+
+class ImageUnavailable(Exception):
+    """The source image could not be fetched or decoded (recently, for negative-cached URLs)."""
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def check_url(url):
+    """
+    Only public http(s) hosts: the proxy must not be a way into our own network.
+    Returns (parsed URL, vetted address). The fetch must connect to that address,
+    since a second DNS lookup could return something else (DNS rebinding).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in DEFAULT_PORTS or not parsed.hostname:
+        raise ValueError("Only http(s) image URLs are supported")
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or DEFAULT_PORTS[parsed.scheme], type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ImageUnavailable(f"Cannot resolve {parsed.hostname}: {e}")
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError("Image host is not publicly routable")
+    return parsed, addresses[0]
+
+
+def pinned_session(hostname):
+    """A requests session whose HTTPS connections send SNI for, and verify the certificate against, `hostname`."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class PinnedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs["server_hostname"] = hostname
+            kwargs["assert_hostname"] = hostname
+            super().init_poolmanager(*args, **kwargs)
+
+    session = requests.Session()
+    session.mount("https://", PinnedAdapter())
+    return session
+
+
+def fetch_url(url, timeout=5, max_bytes=MAX_SOURCE_BYTES):
+    """Download an image over HTTP(S), refusing non-images and anything over `max_bytes`."""
+    parsed, address = check_url(url)
+    # Connect to the address that was checked; the original name goes in Host and SNI
+    host = f"[{address}]" if ":" in address else address
+    pinned = parsed._replace(netloc=host if parsed.port is None else f"{host}:{parsed.port}").geturl()
+    headers = {
+        "Host": parsed.netloc.rsplit("@", 1)[-1],
+        "User-Agent": "Mozilla/5.0 (compatible; SuiTentImageProxy/1.0)",
+    }
+    with pinned_session(parsed.hostname) as session, \
+            session.get(pinned, timeout=timeout, stream=True, allow_redirects=False, headers=headers) as response:
+        response.raise_for_status()
+        if not response.headers.get("Content-Type", "").startswith("image/"):
+            raise ImageUnavailable(f"Not an image: {response.headers.get('Content-Type')}")
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(64 * 1024):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ImageUnavailable("Image exceeds the size limit")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def local_fetcher(root):
+    """Fetcher that serves file names under `root` as if they were URLs (tests and benchmarks)."""
+    def fetch(url):
+        path = os.path.join(root, os.path.basename(urlparse(url).path))
+        with open(path, "rb") as f:
+            return f.read()
+    return fetch
+
+
+class ImageProxy:
+    """
+    Serves asset images at fixed card sizes.
+
+    The first request for a URL fetches the original once, renders every
+    size in CARD_SIZES on `executor` and stores them in `store`; later
+    requests, for any size, are served from the store. Concurrent misses on
+    the same URL share one render. Failed URLs are remembered for
+    `negative_ttl` seconds so a dead link isn't re-fetched for every card.
+
+    sign() and verify() let the HTTP endpoints accept only URLs this backend
+    handed out. Every worker must share `secret`; without one, a random
+    per-process secret is used.
+    """
+
+    def __init__(self, store, executor, fetch=fetch_url, sizes=CARD_SIZES, quality=75, negative_ttl=300, secret=None):
+        self.store = store
+        self.secret = secret.encode() if isinstance(secret, str) else (secret or os.urandom(32))
+        self.executor = executor
+        self.fetch = fetch
+        self.sizes = sizes
+        self.quality = quality
+        self.negative_ttl = negative_ttl
+        self._inflight = {}
+        self._failures = OrderedDict()  # url -> (expires at, reason), oldest first
+        self._lock = threading.Lock()
+        self._counters = {"renders": 0, "render_errors": 0, "coalesced": 0, "negative_hits": 0,
+                          "source_bytes": 0, "rendered_bytes": 0}
+
+    def sign(self, url):
+        return hmac.new(self.secret, url.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def verify(self, url, signature):
+        return bool(signature) and hmac.compare_digest(self.sign(url), signature)
+
+    def lookup(self, url, size):
+        """(digest, content type, bytes) if already rendered; raises ValueError for an unknown size."""
+        if size not in self.sizes:
+            raise ValueError(f"Unknown size {size!r}; expected one of {', '.join(self.sizes)}")
+        return self.store.get(url, size)
+
+    def submit(self, url):
+        """
+        Future for rendering `url` at every size, shared with any render
+        already in flight. Raises executors.Saturated if the pool is full.
+        """
+        if urlparse(url).scheme not in DEFAULT_PORTS:
+            raise ValueError("Only http(s) image URLs are supported")
+        with self._lock:
+            failure = self._failures.get(url)
+            if failure is not None:
+                if failure[0] > time.monotonic():
+                    self._counters["negative_hits"] += 1
+                    raise ImageUnavailable(failure[1])
+                del self._failures[url]
+            future = self._inflight.get(url)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return future
+            future = self._inflight[url] = self.executor.submit(self._render, url)
+        future.add_done_callback(lambda f: self._done(url))
+        return future
+
+    def get(self, url, size, timeout=15):
+        """Blocking lookup-or-render for threaded servers."""
+        hit = self.lookup(url, size)
+        if hit is None:
+            self.submit(url).result(timeout)
+            hit = self.store.get(url, size)
+            if hit is None:
+                raise ImageUnavailable("Rendered image was evicted before it could be served")
+        return hit
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._inflight)
+            stats["failed_urls"] = len(self._failures)
+        stats["store"] = self.store.stats()
+        return stats
+
+    # --- internals ---
+
+    def _render(self, url):
+        try:
+            data = self.fetch(url)
+            variants, content_type = render_sizes(data, self.sizes, self.quality)
+        except Exception as e:
+            with self._lock:
+                self._counters["render_errors"] += 1
+                self._failures[url] = (time.monotonic() + self.negative_ttl, str(e))
+                if len(self._failures) > MAX_FAILED_URLS:
+                    self._failures.popitem(last=False)
+            log.info("Image render failed for %s: %s", url, e)
+            raise ImageUnavailable(str(e))
+        digests = self.store.put(url, variants, content_type)
+        with self._lock:
+            self._counters["renders"] += 1
+            self._counters["source_bytes"] += len(data)
+            self._counters["rendered_bytes"] += sum(len(v) for v in variants.values())
+        return digests
+
+    def _done(self, url):
+        with self._lock:
+            self._inflight.pop(url, None)
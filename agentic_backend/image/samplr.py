@@ -1,2 +1,66 @@
-# Empty sample file for image processing utilities
-# This can be expanded later for image handling functionality
\ No newline at end of file
+import io
+
+# Bounding boxes (width, height) for the asset cards the frontend renders.
+# Images are shrunk to fit, keeping their aspect ratio, and never enlarged.
+CARD_SIZES = {
+    "sm": (160, 120),
+    "md": (320, 240),
+    "lg": (640, 480),
+}
+DEFAULT_SIZE = "md"
+
+# Refuse to decode anything bigger (decompression bombs, huge posters)
+MAX_PIXELS = 40 * 1000 * 1000
+
+
+def output_format():
+    """(Pillow format, content type): WebP when this Pillow build has it, else JPEG."""
+    from PIL import features
+    return ("WEBP", "image/webp") if features.check("webp") else ("JPEG", "image/jpeg")
+
+
+def decode(data, box):
+    """
+    Open `data` as an image, ready to be shrunk into `box`. JPEGs are decoded
+    straight at a reduced scale, which is most of the cost for large photos.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > MAX_PIXELS:
+        raise ValueError(f"Image too large: {image.width}x{image.height}")
+    image.draft("RGB", box)
+    # Animated GIF/WebP: only the first frame is used
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buffer, fmt, quality=quality, method=4)
+    else:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, fmt, quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_sizes(data, sizes=CARD_SIZES, quality=75):
+    """
+    Decode `data` once and re-encode it at every card size.
+    Returns ({size name: encoded bytes}, content type).
+    """
+    from PIL import Image
+
+    fmt, content_type = output_format()
+    # Largest first, so each smaller size is resampled from the previous one
+    order = sorted(sizes, key=lambda name: sizes[name][0] * sizes[name][1], reverse=True)
+    image = decode(data, sizes[order[0]])
+    rendered = {}
+    for name in order:
+        image = image.copy()
+        image.thumbnail(sizes[name], Image.LANCZOS)
+        rendered[name] = encode(image, fmt, quality)
+    return rendered, content_type
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """
+    Content-addressed on-disk cache of rendered images.
+
+    Each blob is stored once under the sha256 of its bytes, so the same
+    picture reached through different URLs shares a file. A small SQLite
+    index maps (source URL, size) to a blob and tracks blob access times.
+    Once blobs exceed `max_bytes`, the least recently served ones are
+    deleted together with every variant that points at them.
+    """
+
+    # Hits record access times in memory; they are written in batches
+    TOUCH_BATCH = 256
+    TOUCH_INTERVAL = 30.0
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._db = None
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._touched_at = time.monotonic()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, url, size):
+        """(digest, content type, bytes) for a rendered variant, or None."""
+        key = source_key(url)
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT v.digest, v.content_type FROM variants v JOIN blobs b ON b.digest = v.digest "
+                "WHERE v.source = ? AND v.size = ?",
+                (key, size),
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+        digest, content_type = row
+        # Blobs are immutable and replaced atomically: read without holding the lock
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            # File removed behind our back: forget it and render again
+            with self._lock:
+                db = self._conn()
+                self._delete_blobs(db, [digest])
+                db.commit()
+                self._counters["misses"] += 1
+            return None
+        with self._lock:
+            self._touched[digest] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH or time.monotonic() - self._touched_at >= self.TOUCH_INTERVAL:
+                self._flush_touched(self._conn())
+                self._db.commit()
+            self._counters["hits"] += 1
+        return digest, content_type, data
+
+    def put(self, url, variants, content_type):
+        """Store {size: bytes} rendered from `url`. Returns {size: digest}."""
+        key = source_key(url)
+        now = time.time()
+        digests = {size: hashlib.sha256(data).hexdigest() for size, data in variants.items()}
+        # Files are written outside the lock; identical content lands on the same path
+        for size, data in variants.items():
+            self._write(digests[size], data)
+        with self._lock:
+            db = self._conn()
+            for size, data in variants.items():
+                db.execute(
+                    "INSERT OR REPLACE INTO blobs (digest, bytes, accessed_at) VALUES (?, ?, ?)",
+                    (digests[size], len(data), now),
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO variants (source, size, digest, content_type) VALUES (?, ?, ?, ?)",
+                    (key, size, digests[size], content_type),
+                )
+            self._counters["writes"] += len(variants)
+            # Eviction goes by accessed_at: bring it up to date first
+            self._flush_touched(db)
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM blobs").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(db, total - self.max_bytes)
+            db.commit()
+        return digests
+
+    def stats(self):
+        with self._lock:
+            db = self._conn()
+            blobs, total = db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM blobs").fetchone()
+            stats = dict(self._counters)
+            stats.update({"blobs": blobs, "bytes": total, "max_bytes": self.max_bytes, "root": self.root})
+        return stats
+
+    # --- internals ---
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write(self, digest, data):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _conn(self):
+        # Caller holds self._lock
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, bytes INTEGER, accessed_at REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed_at)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS variants ("
+                "source TEXT, size TEXT, digest TEXT, content_type TEXT, PRIMARY KEY (source, size))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS variants_digest ON variants (digest)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _flush_touched(self, db):
+        # Caller holds self._lock
+        if self._touched:
+            db.executemany(
+                "UPDATE blobs SET accessed_at = ? WHERE digest = ?",
+                [(accessed_at, digest) for digest, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def _evict(self, db, excess):
+        """Delete least recently served blobs until `excess` bytes are freed."""
+        freed = 0
+        victims = []
+        for digest, size in db.execute("SELECT digest, bytes FROM blobs ORDER BY accessed_at ASC"):
+            if freed >= excess:
+                break
+            victims.append(digest)
+            freed += size
+        self._delete_blobs(db, victims)
+        self._counters["evictions"] += len(victims)
+
+    def _delete_blobs(self, db, digests):
+        for digest in digests:
+            self._touched.pop(digest, None)
+            db.execute("DELETE FROM variants WHERE digest = ?", (digest,))
+            db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+
+def source_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def default_image_dir():
+    # /tmp is the only writable location on serverless hosts
+    return os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "suitent_images"))
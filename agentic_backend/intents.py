@@ -0,0 +1,197 @@
+import re
+from collections import namedtuple
+
+# Typed result of the regex intent stage. Fields that don't apply to a kind are None.
+Intent = namedtuple(
+    "Intent",
+    ["kind", "amount", "from_token", "to_token", "percentage", "order_type", "token"],
+    defaults=(None, None, None, None, None, None),
+)
+
+SWAP = "swap"
+TP_SL = "tp_sl"
+PRICE_CHECK = "price_check"
+
+# Each grammar is (pattern, group order). Order matters: the first pattern that
+# matches anywhere in the query wins, exactly like the old sequential loops.
+SWAP_PATTERNS = [
+    (r'swap\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)', "amount_from_to"),
+    (r'swap\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', "amount_from_to"),
+    (r'trade\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', "amount_from_to"),
+    (r'trade\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)', "amount_from_to"),
+    (r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)', "amount_from_to"),
+    (r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', "amount_from_to"),
+    (r'convert\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)', "amount_from_to"),
+    (r'convert\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', "amount_from_to"),
+    (r'sell\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)', "amount_from_to"),
+    (r'buy\s+(\w+)\s+with\s+(\d*\.?\d+)\s+(\w+)', "to_amount_from"),  # buy TOKEN with AMOUNT TOKEN
+    (r'get\s+(\w+)\s+for\s+(\d*\.?\d+)\s+(\w+)', "to_amount_from"),   # get TOKEN for AMOUNT TOKEN
+]
+
+TP_SL_PATTERNS = [
+    # Take Profit patterns (with optional spaces around %)
+    r'(?:create|set).*take\s*profit.*?at\s*(\d+)\s*%',
+    r'take\s*profit.*?at\s*(\d+)\s*%',
+    r'tp.*?at\s*(\d+)\s*%',
+    r'take\s*profit.*?(\d+)\s*percent',
+    r'set.*?tp.*?(\d+)\s*%',
+    # Stop Loss patterns (with optional spaces around %)
+    r'(?:create|set).*stop\s*loss.*?at\s*(\d+)\s*%',
+    r'stop\s*loss.*?at\s*(\d+)\s*%',
+    r'sl.*?at\s*(\d+)\s*%',
+    r'stop\s*loss.*?(\d+)\s*percent',
+    r'set.*?sl.*?(\d+)\s*%',
+    # More flexible patterns
+    r'(?:take\s*profit|tp).*?(\d+)\s*%.*?(?:current|price)',
+    r'(?:stop\s*loss|sl).*?(\d+)\s*%.*?(?:current|price)',
+]
+
+PRICE_CHECK_PATTERNS = [
+    r'what.*current.*price.*(\w+)',
+    r'current.*price.*(\w+)',
+    r'price.*of.*(\w+)',
+    r'(\w+).*price.*now',
+    r'show.*price.*(\w+)',
+    r'get.*price.*(\w+)',
+]
+
+# Normalize token symbols (handle common variations)
+TOKEN_ALIASES = {
+    'DEEP': 'DEEP',
+    'SUI': 'SUI',
+    'USDC': 'USDC',
+    'USDT': 'USDT',
+    'BTC': 'BTC',
+    'ETH': 'ETH',
+    'WETH': 'WETH',
+}
+
+# Cheap substring prefilters: a family's regex only runs if one of its words is present.
+SWAP_KEYWORDS = ('swap', 'trade', 'exchange', 'convert', 'sell', 'buy', 'get')
+TP_SL_KEYWORDS = ('profit', 'loss', 'tp', 'sl')
+# Order type: take profit wins when both sides are mentioned; "tp"/"sl" only as whole
+# words, so "output" or "slippage" don't pick a side
+_TAKE_PROFIT_WORDS = re.compile(r'profit|\btp\b')
+_STOP_LOSS_WORDS = re.compile(r'stop|\bsl\b')
+_DIGIT = re.compile(r'\d')
+
+
+def _combine(patterns):
+    """
+    Fold a priority-ordered list of patterns into one compiled regex.
+
+    Every alternative is a lookahead anchored at the start of the string, so the
+    regex engine tries them in list order and each one behaves like re.search.
+    Returns the compiled regex and a map of wrapper group index -> (alternative
+    index, index of its first inner group).
+    """
+    parts = []
+    group_map = {}
+    next_group = 1
+    for i, pattern in enumerate(patterns):
+        inner_groups = re.compile(pattern).groups
+        group_map[next_group] = (i, next_group + 1)
+        parts.append(f"(?=[\\s\\S]*?({pattern}))")
+        next_group += inner_groups + 1
+    return re.compile("|".join(parts)), group_map
+
+
+_SWAP_RE, _SWAP_GROUPS = _combine([p for p, _ in SWAP_PATTERNS])
+_TP_SL_RE, _TP_SL_GROUPS = _combine(TP_SL_PATTERNS)
+_PRICE_RE, _PRICE_GROUPS = _combine(PRICE_CHECK_PATTERNS)
+
+
+def _groups(match, group_map, count):
+    index, first = group_map[match.lastindex]
+    return index, [match.group(first + k) for k in range(count)]
+
+
+def _swap_intent(match):
+    index, (a, b, c) = _groups(match, _SWAP_GROUPS, 3)
+    if SWAP_PATTERNS[index][1] == "to_amount_from":
+        to_token, amount, from_token = a.upper(), b, c.upper()
+    else:
+        amount, from_token, to_token = a, b.upper(), c.upper()
+    return Intent(
+        SWAP,
+        amount=amount,
+        from_token=TOKEN_ALIASES.get(from_token, from_token),
+        to_token=TOKEN_ALIASES.get(to_token, to_token),
+    )
+
+
+def _tp_sl_intent(match, query_lower):
+    _, (percentage,) = _groups(match, _TP_SL_GROUPS, 1)
+    # Take profit if it is mentioned at all, or if neither side is
+    is_take_profit = _TAKE_PROFIT_WORDS.search(query_lower) or not _STOP_LOSS_WORDS.search(query_lower)
+    order_type = "take_profit" if is_take_profit else "stop_loss"
+    return Intent(TP_SL, percentage=percentage, order_type=order_type)
+
+
+def _price_check_intent(match):
+    _, (token,) = _groups(match, _PRICE_GROUPS, 1)
+    return Intent(PRICE_CHECK, token=token.upper())
+
+
+def classify_intent(query):
+    """
+    Run the swap, TP/SL and price-check grammars over a query in one pass.
+    Returns an Intent, or None for free-form chat that should go to the LLM.
+    """
+    query_lower = query.lower()
+    has_digit = _DIGIT.search(query_lower) is not None
+
+    if has_digit and any(k in query_lower for k in SWAP_KEYWORDS):
+        match = _SWAP_RE.match(query_lower)
+        if match:
+            return _swap_intent(match)
+
+    if has_digit and any(k in query_lower for k in TP_SL_KEYWORDS):
+        match = _TP_SL_RE.match(query_lower)
+        if match:
+            return _tp_sl_intent(match, query_lower)
+
+    if 'price' in query_lower:
+        match = _PRICE_RE.match(query_lower)
+        if match:
+            return _price_check_intent(match)
+
+    return None
+
+
+def intent_response(intent):
+    """
+    Build the JSON payload /chat returns for a regex-detected intent.
+    """
+    if intent.kind == SWAP:
+        return {
+            "type": "swap_intent",
+            "swap_data": {
+                "amount": intent.amount,
+                "from_token": intent.from_token,
+                "to_token": intent.to_token
+            },
+            "message": f"Ready to swap {intent.amount} {intent.from_token} to {intent.to_token}. Confirm?",
+            "assets": []
+        }
+
+    if intent.kind == TP_SL:
+        is_take_profit = intent.order_type == "take_profit"
+        direction = "above" if is_take_profit else "below"
+        return {
+            "type": "tp_sl_intent",
+            "tp_sl_data": {
+                "type": intent.order_type,
+                "percentage": intent.percentage,
+                "direction": direction
+            },
+            "message": f"Perfect! I'll set a {'take profit' if is_take_profit else 'stop loss'} level at {intent.percentage}% {direction} the current market price. This will be automatically calculated using real-time price data and visualized on your trading chart. You can monitor it in the /swap page!",
+            "assets": []
+        }
+
+    return {
+        "type": "price_check",
+        "token": intent.token,
+        "message": f"I'll get the current price for {intent.token}. Check your trading chart for the most up-to-date price information!",
+        "assets": []
+    }
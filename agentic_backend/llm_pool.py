@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# langchain_groq and httpx are imported on the first get(), so processes that
+# only serve quotes and regex intents never pay for them at cold start
+ChatGroq = None
+
+
+def _chat_groq():
+    global ChatGroq
+    if ChatGroq is None:
+        from langchain_groq import ChatGroq
+    return ChatGroq
+
+
+class LLMPool:
+    """
+    Reuses ChatGroq clients across requests instead of building new ones per call.
+
+    Clients are keyed by (sha256 of the API key, model), so raw keys are never
+    held as dict keys. Every client shares one keep-alive httpx connection pool,
+    so requests after the first skip the TCP/TLS handshake to Groq. The pool
+    holds at most `max_size` clients and drops ones unused for `idle_ttl` seconds.
+    """
+
+    def __init__(self, max_size=128, idle_ttl=900, max_connections=100):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_connections = max_connections
+        self.http_client = None
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, api_key, model):
+        key = (hashlib.sha256(api_key.encode()).hexdigest(), model)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._counters["hits"] += 1
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                return entry[0]
+
+            self._counters["misses"] += 1
+            if self.http_client is None:
+                self.http_client = self._http_client()
+            client = _chat_groq()(model=model, api_key=api_key, http_client=self.http_client)
+            self._clients[key] = (client, now)
+            self._evict(now)
+            return client
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            stats = dict(self._counters)
+            stats["size"] = len(self._clients)
+            stats["max_size"] = self.max_size
+            stats["reuse_ratio"] = round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _http_client(self):
+        import httpx
+        return httpx.Client(
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            follow_redirects=True,
+        )
+
+    def _evict(self, now):
+        # Caller holds self._lock; entries are ordered least recently used first
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if len(self._clients) > self.max_size or now - last_used > self.idle_ttl:
+                del self._clients[key]
+                self._counters["evictions"] += 1
+            else:
+                break
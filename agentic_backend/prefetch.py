@@ -0,0 +1,179 @@
+import contextvars
+import logging
+import threading
+from collections import OrderedDict
+
+import executors
+from executors import Saturated
+from intents import classify_intent
+from metrics import registry
+from router import LEARN, classify_route, llm_route
+from search_cache import normalize_query
+from tools import SEARCH_CATEGORY_TIMEOUT, cached_results, run_searcher
+
+log = logging.getLogger(__name__)
+
+PREFETCH_EVENTS = registry.counter(
+    "agentic_prefetch_total", "Suggestion prefetch work and how the next user turn used it.", ("event",)
+)
+
+
+class _Suggestion:
+    __slots__ = ("query", "warm", "needs_search", "cancelled", "future")
+
+    def __init__(self, query):
+        self.query = query
+        self.warm = False          # every category a click searches is cached
+        self.needs_search = True   # False for intents and chat: nothing to warm
+        self.cancelled = False  # read by the worker between searches
+        self.future = None
+
+
+class SuggestionPrefetcher:
+    """
+    Warms the search cache for the follow-up suggestions of a reply, so that
+    clicking one (the most common next turn) is answered from cache.
+
+    Prefetches run on `executor`, a small pool of their own, and back off
+    whenever live searches are queued on executors.search. They are cancelled
+    as soon as the user sends anything other than one of the suggestions.
+    With `route_with_llm`, suggestions the local router is unsure about are
+    also sent to the 8B router, and its decision is kept for route().
+    """
+
+    def __init__(self, executor, router_confidence=0.85, route_with_llm=False,
+                 max_conversations=10000, max_routes=4096):
+        self.executor = executor
+        self.router_confidence = router_confidence
+        self.route_with_llm = route_with_llm
+        self.max_conversations = max_conversations
+        self.max_routes = max_routes
+        self._pending = OrderedDict()  # conversation_id -> {normalized query: _Suggestion}
+        self._routes = OrderedDict()   # normalized query -> RouteDecision
+        self._lock = threading.Lock()
+        self._counters = {
+            "scheduled": 0, "skipped": 0, "cancelled": 0, "searches": 0, "routed": 0,
+            "clicked_warm": 0, "clicked_cold": 0, "clicked_local": 0, "ignored": 0,
+        }
+
+    def schedule(self, conversation_id, suggestions, fast_llm=None):
+        """Prefetch a reply's `suggestions`, replacing any earlier ones for the conversation."""
+        pending = {}
+        for query in suggestions or []:
+            if isinstance(query, str) and query.strip():
+                pending.setdefault(normalize_query(query), _Suggestion(query))
+
+        with self._lock:
+            self._cancel(self._pending.pop(conversation_id, None))
+            if not pending:
+                return
+            self._pending[conversation_id] = pending
+            while len(self._pending) > self.max_conversations:
+                self._cancel(self._pending.popitem(last=False)[1])
+
+            if self._search_busy():
+                self._count("skipped", len(pending))
+                return
+            for suggestion in pending.values():
+                try:
+                    suggestion.future = self.executor.submit(self._run, suggestion, fast_llm)
+                except Saturated:
+                    self._count("skipped")
+                else:
+                    self._count("scheduled")
+
+    def observe(self, conversation_id, query):
+        """
+        Record the user's next message. Returns "warm" or "cold" if it was one
+        of the suggested follow-ups ("local" if it needs no search), None
+        otherwise; other prefetches stop.
+        """
+        with self._lock:
+            pending = self._pending.pop(conversation_id, None)
+            if pending is None:
+                return None
+            clicked = pending.pop(normalize_query(query), None)
+            self._cancel(pending)
+            if clicked is None:
+                self._count("ignored")
+                return None
+            # Left running: the live request may still find later categories cached
+            if not clicked.needs_search:
+                outcome = "local"
+            else:
+                outcome = "warm" if clicked.warm else "cold"
+            self._count("clicked_" + outcome)
+            return outcome
+
+    def route(self, query):
+        """The 8B router's prefetched decision for `query`, if any."""
+        with self._lock:
+            return self._routes.get(normalize_query(query))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending_conversations"] = len(self._pending)
+            stats["routes"] = len(self._routes)
+        # Only clicks that search count towards the hit rate
+        searched = stats["clicked_warm"] + stats["clicked_cold"]
+        stats["hit_rate"] = round(stats["clicked_warm"] / searched, 4) if searched else 0.0
+        clicked = searched + stats["clicked_local"]
+        stats["click_rate"] = round(clicked / (clicked + stats["ignored"]), 4) if clicked + stats["ignored"] else 0.0
+        return stats
+
+    # --- internals ---
+
+    def _count(self, event, amount=1):
+        # Caller holds self._lock
+        self._counters[event] += amount
+        PREFETCH_EVENTS.inc(amount, event)
+
+    def _cancel(self, pending):
+        # Caller holds self._lock
+        for suggestion in (pending or {}).values():
+            if suggestion.future is not None and not suggestion.warm and not suggestion.cancelled:
+                suggestion.cancelled = True
+                suggestion.future.cancel()
+                self._count("cancelled")
+
+    def _search_busy(self):
+        return executors.search.queued() > 0
+
+    def _run(self, suggestion, fast_llm):
+        # Detached from the request that scheduled it: no Server-Timing entries
+        contextvars.Context().run(self._warm, suggestion, fast_llm)
+
+    def _warm(self, suggestion, fast_llm):
+        query = suggestion.query
+        if suggestion.cancelled:
+            return
+        if classify_intent(query):
+            # Answered by the regex intents; nothing to fetch
+            suggestion.needs_search = False
+            return
+
+        route = classify_route(query)
+        if route.confidence < self.router_confidence and self.route_with_llm and fast_llm is not None:
+            route = llm_route(fast_llm, query, route)
+            if route.source == "llm":
+                with self._lock:
+                    self._routes[normalize_query(query)] = route
+                    while len(self._routes) > self.max_routes:
+                        self._routes.popitem(last=False)
+                    self._count("routed")
+        if route.label != LEARN and route.confidence >= self.router_confidence:
+            suggestion.needs_search = False
+            return
+
+        _, missing = cached_results(query)
+        stored = 0
+        for category in missing:
+            if suggestion.cancelled or self._search_busy():
+                return
+            # run_searcher caches non-empty results only; [] also covers an unavailable upstream
+            if run_searcher(category, query, SEARCH_CATEGORY_TIMEOUT, stage_prefix="prefetch_"):
+                stored += 1
+            with self._lock:
+                self._count("searches")
+        suggestion.warm = stored == len(missing)
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class PriceCache:
+    """
+    Shared TTL cache in front of an upstream price fetcher.
+
+    - Fresh entries (younger than `ttl`) are served directly.
+    - Stale entries (younger than `max_stale`) are served immediately while a
+      background thread refreshes them.
+    - Concurrent misses on the same key coalesce into one upstream call.
+    - If the upstream fails, the last known value is served until it is
+      `max_stale` old; after that get() returns None rather than stale data.
+
+    Background refreshes run on `executor` (a private single thread if None).
+    """
+
+    def __init__(self, fetch, ttl=30, max_stale=300, executor=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-cache-refresh")
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "background_refreshes": 0,
+        }
+
+    def get(self, *key):
+        return self.get_with_age(*key)[0]
+
+    def get_with_age(self, *key):
+        """(value, seconds since it was fetched), or (None, None) if nothing younger than `max_stale`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < self.ttl:
+                    self._counters["hits"] += 1
+                    return entry.value, age
+                if age < self.max_stale:
+                    self._counters["stale_hits"] += 1
+                    self._schedule_refresh(key)
+                    return entry.value, age
+            self._counters["misses"] += 1
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = threading.Event()
+                leader = True
+            else:
+                self._counters["coalesced"] += 1
+                leader = False
+
+        if leader:
+            self._load(key, waiter)
+        else:
+            waiter.wait(self._wait_timeout())
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        # A failed refresh leaves the old entry behind: past max_stale it is no answer at all
+        age = time.monotonic() - entry.fetched_at
+        if age >= self.max_stale:
+            return None, None
+        return entry.value, age
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["max_age_seconds"] = round(max((now - e.fetched_at for e in self._entries.values()), default=0.0), 3)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _wait_timeout(self):
+        # Followers never wait longer than an upstream call is allowed to take
+        return max(self.ttl, 10)
+
+    def _load(self, key, waiter):
+        """Fetch `key` upstream, store it and release everyone waiting on it."""
+        try:
+            with self._lock:
+                self._counters["upstream_calls"] += 1
+            value = self.fetch(*key)
+            with self._lock:
+                self._entries[key] = _Entry(value, time.monotonic())
+        except Exception as e:
+            log.warning("Price cache refresh failed for %s: %s", key, e)
+            with self._lock:
+                self._counters["upstream_errors"] += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter.set()
+
+    def _schedule_refresh(self, key):
+        # Caller holds self._lock
+        if key in self._inflight:
+            return
+        waiter = self._inflight[key] = threading.Event()
+        try:
+            self.executor.submit(self._load, key, waiter)
+        except Exception as e:
+            # Refresh pool is saturated: keep serving stale, retry on a later hit
+            log.warning("Price cache refresh not scheduled for %s: %s", key, e)
+            self._inflight.pop(key, None)
+            waiter.set()
+            return
+        self._counters["background_refreshes"] += 1
@@ -0,0 +1,215 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+
+class InsufficientLiquidity(ValueError):
+    """The book is too thin to fill the requested amount."""
+
+
+class _Side:
+    """
+    One direction through a book: spend token_in, receive token_out.
+
+    Levels are stored as cumulative amounts, so filling any number of
+    amounts is a single searchsorted plus one partial level each.
+    """
+
+    __slots__ = ("cum_in", "cum_out", "rate", "best_rate", "mid_rate", "depth")
+
+    def __init__(self, amounts_in, amounts_out, mid_rate):
+        self.cum_in = np.concatenate(([0.0], np.cumsum(amounts_in)))
+        self.cum_out = np.concatenate(([0.0], np.cumsum(amounts_out)))
+        self.rate = amounts_out / amounts_in  # token_out per token_in at each level
+        self.best_rate = float(self.rate[0])
+        self.mid_rate = mid_rate
+        self.depth = float(self.cum_in[-1])
+
+    def fill(self, amounts):
+        """Output for each amount; NaN where the book cannot fill it."""
+        level = np.searchsorted(self.cum_in, amounts, side="left") - 1
+        level = np.minimum(np.maximum(level, 0), len(self.rate) - 1)
+        out = self.cum_out[level] + (amounts - self.cum_in[level]) * self.rate[level]
+        out[amounts > self.depth] = np.nan
+        return out
+
+
+class QuoteEngine:
+    """
+    In-memory order-book depth per pair, quoted by walking the levels.
+
+    Each book contributes two sides (sell base into the bids, buy base from the
+    asks). Pairs without a book are routed through one intermediate token,
+    e.g. DEEP -> SUI -> USDC, picking whichever path fills best per amount.
+    """
+
+    def __init__(self):
+        self._sides = {}
+        self._tokens = set()
+        self._paths = {}
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """
+        Load a JSON snapshot ({"pairs": [{"base", "quote", "bids", "asks"}]} with
+        [price, size] levels) or a CSV with base,quote,side,price,size rows.
+        """
+        engine = cls()
+        if path.endswith(".csv"):
+            books = {}
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    book = books.setdefault((row["base"], row["quote"]), {"bids": [], "asks": []})
+                    book[row["side"]].append([float(row["price"]), float(row["size"])])
+            for (base, quote), book in books.items():
+                engine.add_book(base, quote, book["bids"], book["asks"])
+        else:
+            with open(path) as f:
+                snapshot = json.load(f)
+            for book in snapshot["pairs"]:
+                engine.add_book(book["base"], book["quote"], book["bids"], book["asks"])
+        return engine
+
+    def add_book(self, base, quote, bids, asks):
+        """`bids`/`asks` are [price, size] levels; size is in base units."""
+        base, quote = base.upper(), quote.upper()
+        bids = np.array(sorted(bids, key=lambda level: -level[0]), dtype=float)
+        asks = np.array(sorted(asks, key=lambda level: level[0]), dtype=float)
+        mid = (bids[0, 0] + asks[0, 0]) / 2
+        # Selling base fills at the bids; buying base spends quote at the asks
+        self._sides[(base, quote)] = _Side(bids[:, 1], bids[:, 1] * bids[:, 0], mid)
+        self._sides[(quote, base)] = _Side(asks[:, 1] * asks[:, 0], asks[:, 1], 1 / mid)
+        self._tokens.update((base, quote))
+        self._paths.clear()
+
+    def pairs(self):
+        return sorted(self._sides)
+
+    def paths(self, token_in, token_out):
+        """Direct book if there is one, otherwise every one-hop route."""
+        # Only pairs of listed tokens are cached, so junk input can't grow the cache
+        if token_in not in self._tokens or token_out not in self._tokens:
+            return []
+        key = (token_in, token_out)
+        paths = self._paths.get(key)
+        if paths is None:
+            if key in self._sides:
+                paths = [[token_in, token_out]]
+            else:
+                paths = [
+                    [token_in, hop, token_out] for (a, hop) in self._sides
+                    if a == token_in and (hop, token_out) in self._sides
+                ]
+            self._paths[key] = paths
+        return paths
+
+    def quote_many(self, token_in, token_out, amounts):
+        """
+        Quote many amounts of one pair at once. Returns a dict of arrays
+        (estimated_out, avg_price, price_impact, slippage; NaN where unfillable)
+        plus the route chosen for each amount.
+        """
+        token_in, token_out = token_in.upper(), token_out.upper()
+        paths = self.paths(token_in, token_out) if token_in != token_out else []
+        if not paths:
+            raise ValueError(f"No route from {token_in} to {token_out}")
+
+        amounts = np.asarray(amounts, dtype=float)
+        outs = np.empty((len(paths), len(amounts)))
+        best_rates = np.empty(len(paths))
+        mid_rates = np.empty(len(paths))
+        for i, path in enumerate(paths):
+            out, best_rate, mid_rate = amounts, 1.0, 1.0
+            for leg in zip(path, path[1:]):
+                side = self._sides[leg]
+                out = side.fill(out)
+                best_rate *= side.best_rate
+                mid_rate *= side.mid_rate
+            outs[i], best_rates[i], mid_rates[i] = out, best_rate, mid_rate
+
+        if len(paths) == 1:
+            choice = np.zeros(len(amounts), dtype=int)
+        else:
+            choice = np.argmax(np.where(np.isnan(outs), -1.0, outs), axis=0)
+        columns = np.arange(len(amounts))
+        out = outs[choice, columns]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_price = out / amounts
+        return {
+            "estimated_out": out,
+            "avg_price": avg_price,
+            # Rounded so a top-of-book fill reads 0 rather than float noise
+            "price_impact": np.round(1 - avg_price / best_rates[choice], 10),
+            "slippage": np.round(1 - avg_price / mid_rates[choice], 10),
+            "route": [paths[c] for c in choice],
+        }
+
+    def quote(self, token_in, token_out, amount_in):
+        """Single /quote payload. Raises ValueError for bad input or an unfillable amount."""
+        return self.quote_batch([(token_in, token_out, amount_in)], strict=True)[0]
+
+    def quote_batch(self, requests, strict=False):
+        """
+        Quote (token_in, token_out, amount_in) triples, vectorized per pair.
+        Results keep request order; failures become {"error": ...} entries
+        (or raise, with `strict`).
+        """
+        results = [None] * len(requests)
+        groups = {}
+        for index, (token_in, token_out, amount_in) in enumerate(requests):
+            try:
+                amount = float(amount_in)
+                if not amount > 0:
+                    raise ValueError("amount_in must be positive")
+            except (TypeError, ValueError) as e:
+                if strict:
+                    raise ValueError(str(e))
+                results[index] = _error(token_in, token_out, amount_in, str(e))
+                continue
+            groups.setdefault((str(token_in).upper(), str(token_out).upper()), []).append((index, amount))
+
+        for (token_in, token_out), items in groups.items():
+            try:
+                quotes = self.quote_many(token_in, token_out, [amount for _, amount in items])
+            except ValueError as e:
+                if strict:
+                    raise
+                for index, _ in items:
+                    results[index] = _error(*requests[index], str(e))
+                continue
+            for row, (index, _) in enumerate(items):
+                token_in_given, token_out_given, amount_in = requests[index]
+                out = quotes["estimated_out"][row]
+                if np.isnan(out):
+                    if strict:
+                        raise InsufficientLiquidity(f"Insufficient liquidity for {amount_in} {token_in}")
+                    results[index] = _error(token_in_given, token_out_given, amount_in, "Insufficient liquidity")
+                    continue
+                results[index] = {
+                    "token_in": token_in_given,
+                    "token_out": token_out_given,
+                    "amount_in": amount_in,
+                    "estimated_out": _fmt(out),
+                    "avg_price": _fmt(quotes["avg_price"][row]),
+                    "slippage": _fmt(quotes["slippage"][row]),
+                    "price_impact": _fmt(quotes["price_impact"][row]),
+                    "route": quotes["route"][row],
+                }
+        return results
+
+
+def _fmt(value):
+    return f"{float(value):.10g}"
+
+
+def _error(token_in, token_out, amount_in, message):
+    return {"token_in": token_in, "token_out": token_out, "amount_in": amount_in, "error": message}
+
+
+def default_snapshot_path():
+    return os.environ.get(
+        "QUOTE_SNAPSHOT",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "orderbook_snapshot.json"),
+    )
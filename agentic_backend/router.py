@@ -0,0 +1,218 @@
+import logging
+import math
+import re
+from collections import namedtuple
+
+from metrics import stage, record_usage
+
+log = logging.getLogger(__name__)
+
+LEARN = "LEARN"
+CHAT = "CHAT"
+
+# label: LEARN or CHAT; confidence: 0.5-1.0; source: "local", "llm" or "llm_error"
+RouteDecision = namedtuple("RouteDecision", ["label", "confidence", "source"])
+
+ROUTER_PROMPT = """
+    Analyze user intent: "{query}"
+
+    CLASSIFICATION CRITERIA:
+    - Respond 'LEARN': If the query contains a SUBJECT (e.g., "Space", "Sui", "React", "Cooking", "DeFi", "News"). Any question starting with "What", "How", "Why", "Tell me about", or "Chat about [topic]" MUST be 'LEARN'.
+    - Respond 'CHAT': ONLY for social filler, greetings ("Hi", "Hello"), or basic wellness checks ("How are you?").
+
+    Decision (LEARN/CHAT):
+    """
+
+BATCH_ROUTER_PROMPT = """
+    Classify the intent of each numbered user message.
+
+    CLASSIFICATION CRITERIA:
+    - 'LEARN': The message contains a SUBJECT (e.g., "Space", "Sui", "React", "Cooking", "DeFi", "News"). Any question starting with "What", "How", "Why", "Tell me about", or "Chat about [topic]" MUST be 'LEARN'.
+    - 'CHAT': ONLY social filler, greetings ("Hi", "Hello"), or basic wellness checks ("How are you?").
+
+    MESSAGES:
+    {queries}
+
+    Reply with exactly one line per message, "<number>: LEARN" or "<number>: CHAT", and nothing else.
+    """
+
+SMALL_TALK = {
+    "hi", "hii", "hello", "hey", "heya", "yo", "sup", "hola", "gm", "gn", "morning", "evening",
+    "night", "bye", "goodbye", "cya", "thanks", "thank", "thx", "ty", "ok", "okay", "k", "cool",
+    "nice", "great", "awesome", "wow", "lol", "lmao", "haha", "hahaha", "yes", "no", "yeah", "nope",
+    "sure", "good", "fine", "love", "cute", "sweet", "sofia", "bro", "dear", "welcome", "sorry",
+    "funny", "job", "much", "doing", "today", "day",
+}
+WELLNESS_PHRASES = (
+    "how are you", "how r u", "how are u", "how's it going", "hows it going", "how is it going",
+    "what's up", "whats up", "how do you do", "how was your day", "how is your day", "how you doing",
+    "nice to meet you", "who are you", "are you there", "good morning", "good night", "good evening",
+)
+QUESTION_CUES = (
+    "what", "how", "why", "when", "where", "which", "who", "explain", "tell me", "teach",
+    "show me", "describe", "define", "compare", "difference", "guide", "tutorial", "learn",
+    "chat about", "talk about", "news", "latest", "recommend", "can you help",
+)
+TOPIC_WORDS = {
+    "sui", "move", "deepbook", "defi", "dex", "blockchain", "crypto", "cryptocurrency", "nft", "nfts",
+    "wallet", "token", "tokens", "bitcoin", "btc", "ethereum", "eth", "solana", "sol", "usdc",
+    "staking", "stake", "liquidity", "pool", "pools", "swap", "swaps", "trading", "market", "price",
+    "contract", "contracts", "ptb", "ptbs", "transaction", "transactions", "validator", "consensus",
+    "gas", "yield", "lending", "oracle", "bridge", "web3", "dao", "airdrop", "suitent", "mysten",
+    "react", "python", "javascript", "rust", "code", "programming", "ai", "space", "cooking",
+    "history", "science", "physics", "math", "news", "economy", "stocks", "music", "movie", "game",
+}
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "am", "was", "i", "me", "my", "you", "your", "u", "it", "to",
+    "of", "and", "or", "in", "on", "for", "do", "does", "be", "so", "too", "just", "really", "very",
+    "there", "this", "that", "we", "our", "with", "at", "please", "pls", "can", "could", "would",
+}
+
+# Hand-tuned linear model over the features below (see test/eval_router.py)
+WEIGHTS = {
+    "bias": 0.4,
+    "small_talk": -1.8,     # per small-talk token
+    "wellness": -4.5,       # contains a wellness/greeting phrase
+    "question": 2.4,        # contains a question cue
+    "topic": 1.8,           # per topic word (capped at 3)
+    "content": 0.45,        # per remaining content word (capped at 6)
+    "question_mark": 0.6,
+    "only_small_talk": -3.0,
+}
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_BATCH_LINE = re.compile(r"^\W*(\d+)\W+(LEARN|CHAT)\b", re.IGNORECASE | re.MULTILINE)
+# Long chat-log lines are cut so one message can't crowd out the rest of a batch
+MAX_BATCH_QUERY_CHARS = 300
+
+
+def route_features(query):
+    text = query.lower().strip()
+    tokens = _TOKEN.findall(text)
+    small_talk = sum(1 for t in tokens if t in SMALL_TALK)
+    topics = sum(1 for t in tokens if t in TOPIC_WORDS)
+    content = sum(1 for t in tokens if t not in SMALL_TALK and t not in TOPIC_WORDS and t not in STOP_WORDS)
+    # "how are you" is small talk, not a "how" question, so cues are looked for
+    # outside the greeting; "good morning, what is DeepBook?" is still a question
+    rest = text
+    wellness = False
+    for phrase in WELLNESS_PHRASES:
+        if phrase in rest:
+            wellness = True
+            rest = rest.replace(phrase, " ")
+    padded = f" {' '.join(_TOKEN.findall(rest))} "
+    question = any(f" {c} " in padded for c in QUESTION_CUES)
+    return {
+        "small_talk": small_talk,
+        # Only a greeting with nothing else to ask about pulls hard towards CHAT
+        "wellness": 1 if wellness and not question and not topics else 0,
+        "question": 1 if question else 0,
+        "topic": min(topics, 3),
+        "content": min(content, 6),
+        "question_mark": 1 if "?" in text else 0,
+        "only_small_talk": 1 if tokens and small_talk == len(tokens) else 0,
+    }
+
+
+def classify_route(query):
+    """
+    Decide LEARN vs CHAT in-process. Returns a RouteDecision whose confidence
+    is the model's probability for the chosen label.
+    """
+    features = route_features(query)
+    score = WEIGHTS["bias"] + sum(WEIGHTS[name] * value for name, value in features.items())
+    p_learn = 1.0 / (1.0 + math.exp(-score))
+    if p_learn >= 0.5:
+        return RouteDecision(LEARN, round(p_learn, 4), "local")
+    return RouteDecision(CHAT, round(1.0 - p_learn, 4), "local")
+
+
+def _llm_decision(content):
+    return RouteDecision(LEARN if LEARN in content.strip().upper() else CHAT, 1.0, "llm")
+
+
+def _fallback_decision(fallback):
+    if fallback is None:
+        return RouteDecision(LEARN, 0.5, "llm_error")
+    return RouteDecision(fallback.label, fallback.confidence, "llm_error")
+
+
+def router_messages(query):
+    # Imported here so regex-matched intents never load LangChain
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=ROUTER_PROMPT.format(query=query))]
+
+
+def llm_route(fast_llm, query, fallback=None):
+    """
+    Ask the fast model to classify the query. On failure, returns `fallback`'s
+    label (LEARN if none) so the reply still gets research context.
+    """
+    try:
+        with stage("router_llm"):
+            result = fast_llm.invoke(router_messages(query))
+        record_usage(fast_llm, result)
+        return _llm_decision(result.content)
+    except Exception as e:
+        log.warning("Router failed: %s", e)
+        return _fallback_decision(fallback)
+
+
+async def allm_route(fast_llm, query, fallback=None):
+    """llm_route for the event loop."""
+    try:
+        with stage("router_llm"):
+            result = await fast_llm.ainvoke(router_messages(query))
+        record_usage(fast_llm, result)
+        return _llm_decision(result.content)
+    except Exception as e:
+        log.warning("Router failed: %s", e)
+        return _fallback_decision(fallback)
+
+
+def batch_router_messages(queries):
+    from langchain_core.messages import HumanMessage
+    lines = "\n".join(
+        f"{number}. {' '.join(query.split())[:MAX_BATCH_QUERY_CHARS]}" for number, query in enumerate(queries, 1)
+    )
+    return [HumanMessage(content=BATCH_ROUTER_PROMPT.format(queries=lines))]
+
+
+def _batch_decisions(content, fallbacks):
+    """One decision per query; lines the model skipped or garbled fall back like a failed call."""
+    labels = {}
+    for number, label in _BATCH_LINE.findall(content):
+        labels.setdefault(int(number), label.upper())
+    return [
+        RouteDecision(labels[number], 1.0, "llm") if number in labels else _fallback_decision(fallback)
+        for number, fallback in enumerate(fallbacks, 1)
+    ]
+
+
+def llm_route_batch(fast_llm, queries, fallbacks=None):
+    """
+    Classify many queries with one fast-model call. Returns a RouteDecision
+    per query, in order; on failure every query gets its fallback's label.
+    """
+    fallbacks = fallbacks or [None] * len(queries)
+    try:
+        with stage("router_llm_batch"):
+            result = fast_llm.invoke(batch_router_messages(queries))
+        record_usage(fast_llm, result)
+        return _batch_decisions(result.content, fallbacks)
+    except Exception as e:
+        log.warning("Batch router failed for %d queries: %s", len(queries), e)
+        return [_fallback_decision(fallback) for fallback in fallbacks]
+
+
+async def allm_route_batch(fast_llm, queries, fallbacks=None):
+    """llm_route_batch for the event loop."""
+    fallbacks = fallbacks or [None] * len(queries)
+    try:
+        with stage("router_llm_batch"):
+            result = await fast_llm.ainvoke(batch_router_messages(queries))
+        record_usage(fast_llm, result)
+        return _batch_decisions(result.content, fallbacks)
+    except Exception as e:
+        log.warning("Batch router failed for %d queries: %s", len(queries), e)
+        return [_fallback_decision(fallback) for fallback in fallbacks]
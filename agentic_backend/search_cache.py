@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "for", "to",
+    "and", "or", "about", "me", "my", "i", "you", "your", "please", "can", "could",
+    "would", "tell", "what", "whats", "what's", "how", "does", "do", "explain", "show",
+}
+
+# Videos and docs go stale slowly; image and article results churn faster
+DEFAULT_TTLS = {
+    "videos": 24 * 3600,
+    "docs": 24 * 3600,
+    "articles": 6 * 3600,
+    "images": 6 * 3600,
+}
+
+_NON_WORD = re.compile(r"[^\w\s'.-]+")
+
+
+def normalize_query(query):
+    """
+    Canonical form used as the cache key: lowercase, punctuation and
+    stop-words removed, whitespace collapsed.
+    """
+    words = _NON_WORD.sub(" ", query.lower()).split()
+    kept = [w.strip(".'-") for w in words if w not in STOP_WORDS]
+    kept = [w for w in kept if w]
+    # A query made only of stop-words still needs a stable key
+    return " ".join(kept or words)
+
+
+class SearchCache:
+    """
+    Two-tier cache for search_web results, one entry per (category, query).
+
+    The in-memory LRU tier absorbs repeats within a process; the SQLite tier
+    survives restarts and cold starts. Both tiers evict by payload size.
+    Each tier has its own lock, so memory hits never wait on disk I/O.
+    """
+
+    # Disk-hit access times are written in batches, not one UPDATE per hit
+    TOUCH_BATCH = 64
+    TOUCH_INTERVAL = 30.0
+
+    def __init__(self, path=None, ttls=None, memory_bytes=4 * 1024 * 1024, disk_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_lock = threading.Lock()
+        self._disk_size = 0
+        self._touched = {}
+        self._touched_at = time.monotonic()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # --- public API ---
+
+    def get(self, category, query):
+        key = self._key(category, query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                payload, created_at = entry
+                if now - created_at < self._ttl(category):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return json.loads(payload)
+                self._drop_memory(key)
+
+        with self._disk_lock:
+            row = self._disk_get(key, now)
+            if row is not None and now - row[1] >= self._ttl(category):
+                self._disk_delete(key)
+                row = None
+
+        with self._lock:
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            payload, created_at = row
+            self._memory_put(key, payload, created_at)
+            self._counters["disk_hits"] += 1
+        return json.loads(payload)
+
+    def put(self, category, query, value):
+        key = self._key(category, query)
+        payload = json.dumps(value, separators=(",", ":"))
+        created_at = time.time()
+        with self._lock:
+            self._memory_put(key, payload, created_at)
+            self._counters["writes"] += 1
+        with self._disk_lock:
+            evicted = self._disk_put(key, category, normalize_query(query), payload, created_at)
+        if evicted:
+            with self._lock:
+                self._counters["evictions"] += evicted
+
+    def purge(self, category=None, query=None):
+        """Remove entries matching the filters (everything if none). Returns the count removed."""
+        clauses, params = [], []
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if query:
+            clauses.append("query = ?")
+            params.append(normalize_query(query))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        removed = 0
+        with self._disk_lock:
+            db = self._conn()
+            if db is not None:
+                removed = db.execute(f"DELETE FROM search_cache{where}", params).rowcount
+                db.commit()
+                self._disk_size = self._disk_total(db)
+
+        with self._lock:
+            for key in list(self._memory):
+                key_category, key_query = key.split("|", 1)
+                if (not category or key_category == category) and (not query or key_query == normalize_query(query)):
+                    self._drop_memory(key)
+                    if db is None:
+                        removed += 1
+        return removed
+
+    def entries(self, limit=100):
+        """Most recently written entries, without payloads."""
+        with self._disk_lock:
+            db = self._conn()
+            if db is not None:
+                rows = db.execute(
+                    "SELECT category, query, size, created_at FROM search_cache ORDER BY created_at DESC LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                return [{"category": r[0], "query": r[1], "bytes": r[2], "created_at": r[3]} for r in rows]
+        with self._lock:
+            return [{"category": k.split("|", 1)[0], "query": k.split("|", 1)[1], "bytes": len(p), "created_at": c}
+                    for k, (p, c) in reversed(self._memory.items())][:limit]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+        with self._disk_lock:
+            db = self._conn()
+            if db is not None:
+                stats["disk_entries"] = db.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+                stats["disk_bytes"] = self._disk_size
+        stats["path"] = self.path
+        stats["ttls"] = self.ttls
+        return stats
+
+    # --- memory tier (caller holds self._lock) ---
+
+    def _key(self, category, query):
+        return f"{category}|{normalize_query(query)}"
+
+    def _ttl(self, category):
+        return self.ttls.get(category, 3600)
+
+    def _memory_put(self, key, payload, created_at):
+        self._drop_memory(key)
+        self._memory[key] = (payload, created_at)
+        self._memory_size += len(payload)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[0])
+
+    # --- disk tier (caller holds self._disk_lock) ---
+
+    def _conn(self):
+        if self._db is None and self.path:
+            try:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                # A cache can lose its last writes in a power cut; no fsync per commit
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS search_cache ("
+                    "key TEXT PRIMARY KEY, category TEXT, query TEXT, payload TEXT, "
+                    "size INTEGER, created_at REAL, accessed_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS search_cache_accessed ON search_cache (accessed_at)")
+                self._db.commit()
+                self._disk_size = self._disk_total(self._db)
+            except sqlite3.Error as e:
+                # Read-only filesystem or similar: run memory-only
+                log.warning("Search cache disk tier disabled: %s", e)
+                self.path = None
+                self._db = None
+        return self._db
+
+    def _disk_total(self, db):
+        return db.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+
+    def _disk_get(self, key, now):
+        db = self._conn()
+        if db is None:
+            return None
+        row = db.execute("SELECT payload, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH or time.monotonic() - self._touched_at >= self.TOUCH_INTERVAL:
+                self._flush_touched(db)
+                db.commit()
+        return row
+
+    def _flush_touched(self, db):
+        if self._touched:
+            db.executemany(
+                "UPDATE search_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def _disk_put(self, key, category, query, payload, created_at):
+        """Write one entry, evicting if the tier is over budget. Returns the number of rows evicted."""
+        db = self._conn()
+        if db is None:
+            return 0
+        old = db.execute("SELECT size FROM search_cache WHERE key = ?", (key,)).fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO search_cache (key, category, query, payload, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, category, query, payload, len(payload), created_at, created_at),
+        )
+        # Pending access times ride along in this write's transaction
+        self._touched.pop(key, None)
+        self._flush_touched(db)
+        self._disk_size += len(payload) - (old[0] if old else 0)
+        evicted = 0
+        if self._disk_size > self.disk_bytes:
+            # Other workers share the file: recount before deciding what to drop
+            self._disk_size = self._disk_total(db)
+            if self._disk_size > self.disk_bytes:
+                # Free a tenth of the budget at once so a full tier doesn't evict on every put
+                evicted = self._disk_evict(db, self._disk_size - int(self.disk_bytes * 0.9))
+        db.commit()
+        return evicted
+
+    def _disk_evict(self, db, excess):
+        """Delete least recently accessed rows until `excess` bytes are freed. Returns the count."""
+        freed = 0
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM search_cache ORDER BY accessed_at ASC"):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        db.executemany("DELETE FROM search_cache WHERE key = ?", victims)
+        self._disk_size -= freed
+        return len(victims)
+
+    def _disk_delete(self, key):
+        db = self._conn()
+        if db is not None:
+            row = db.execute("SELECT size FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                db.commit()
+                self._disk_size -= row[0]
+            self._touched.pop(key, None)
+
+
+def default_cache_path():
+    # /tmp is the only writable location on serverless hosts
+    return os.environ.get("SEARCH_CACHE_PATH", os.path.join(tempfile.gettempdir(), "suitent_search_cache.sqlite3"))
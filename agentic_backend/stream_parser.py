@@ -0,0 +1,152 @@
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class SegmentStreamParser:
+    """
+    Incremental parser for the LLM's JSON reply, fed one token chunk at a time.
+
+    It emits an event as soon as each piece of the top-level object is complete:
+    - {"event": "segment", "index": i, "data": {...}} for every element of the
+      `stream_key` array ("messages"), the moment its closing brace arrives;
+    - {"event": <key>, "data": value} for every other top-level field
+      (html_response, suggestions, ...).
+
+    Anything before the first '{' (prose, ```json fences) is ignored. Malformed
+    pieces are skipped; the caller still has the full text in `buffer`.
+    """
+
+    def __init__(self, stream_key="messages"):
+        self.stream_key = stream_key
+        self.buffer = ""
+        self.segments = 0
+        self.fields = set()
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        # Parser state for the root object (depth 1)
+        self._expect_key = False
+        self._key = None
+        self._value_start = None
+        self._in_stream = False
+        # Start of the current element of the streamed array (depth 2)
+        self._item_start = None
+
+    def feed(self, chunk):
+        events = []
+        if self.done or not chunk:
+            return events
+        self.buffer += chunk
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if ch in _WHITESPACE:
+                continue
+
+            if self._depth == 1:
+                if self._value_start is None and not self._expect_key and self._key is not None and ch != ":":
+                    self._value_start = i
+                if ch == ",":
+                    self._finish_primitive(i, events)
+                    self._expect_key = True
+                    continue
+                if ch == "}":
+                    self._finish_primitive(i, events)
+                    self._depth = 0
+                    self.done = True
+                    break
+
+            if self._in_stream and self._depth == 2 and self._item_start is None and ch not in ",]":
+                self._item_start = i
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if self._depth == 1 and ch == "[" and self._key == self.stream_key:
+                    self._in_stream = True
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._in_stream:
+                    self._emit_item(i + 1, events)
+                elif self._depth == 1:
+                    self._in_stream = False
+                    self._emit_field(i + 1, events)
+
+        self._pos = len(buf)
+        return events
+
+    # --- helpers ---
+
+    def _string_closed(self, end, events):
+        if self._depth == 1:
+            if self._expect_key:
+                key = self._load(self._string_start, end + 1)
+                self._key = None if key is _INVALID else key
+                self._expect_key = False
+                self._value_start = None
+            else:
+                self._emit_field(end + 1, events)
+        elif self._depth == 2 and self._in_stream:
+            self._emit_item(end + 1, events)
+
+    def _finish_primitive(self, end, events):
+        # Numbers, booleans and null have no closing delimiter of their own
+        if self._value_start is not None and self._key is not None:
+            self._emit_field(end, events)
+
+    def _emit_field(self, end, events):
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        if key is None or start is None:
+            return
+        value = self._load(start, end)
+        if value is _INVALID:
+            return
+        self.fields.add(key)
+        if key != self.stream_key:
+            events.append({"event": key, "data": value})
+
+    def _emit_item(self, end, events):
+        start = self._item_start
+        self._item_start = None
+        if start is None:
+            return
+        value = self._load(start, end)
+        if value is _INVALID:
+            return
+        events.append({"event": "segment", "index": self.segments, "data": value})
+        self.segments += 1
+
+    def _load(self, start, end):
+        try:
+            return json.loads(self.buffer[start:end])
+        except ValueError:
+            return _INVALID
+
+
+_INVALID = object()
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+os.environ.setdefault("SUGGESTION_PREFETCH", "0")
+
+import fakes
+
+fakes.install()
+
+from app import app
+
+
+def load_queries(count):
+    """intent_corpus.json plus router_queries.json, repeated like a chat log."""
+    with open(os.path.join(HERE, "intent_corpus.json")) as f:
+        queries = [case["query"] for case in json.load(f)]
+    with open(os.path.join(HERE, "router_queries.json")) as f:
+        queries += [case["query"] for case in json.load(f)]
+    return [queries[i % len(queries)] for i in range(count)]
+
+
+def main(count=5000):
+    """
+    Classifying a replayed chat log against the Flask app (test client, fake
+    8B model): one GET /chat per query, which only answers the regex intents,
+    vs. one streamed POST /classify with and without the batched router.
+    """
+    client = app.test_client()
+    queries = load_queries(count)
+
+    start = time.perf_counter()
+    for query in queries:
+        client.get("/chat", query_string={"query": query, "api_key": "bench"}).get_data()
+    per_query = time.perf_counter() - start
+    print(f"GET /chat x{count:<6}                  {per_query * 1000:>9.0f} ms  (also answers non-intents with the 70B model)")
+
+    for route in (False, True):
+        start = time.perf_counter()
+        response = client.post("/classify", json={"queries": queries, "route": route, "api_key": "bench"})
+        lines = response.get_data(as_text=True).splitlines()
+        elapsed = time.perf_counter() - start
+        done = json.loads(lines[-1])
+        print(f"POST /classify route={route!s:<5}        {elapsed * 1000:>9.0f} ms  "
+              f"{done['sources']} in {done['llm_batches']} router calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ["langchain_core", "langchain_groq", "httpx", "duckduckgo_search", "requests", "numpy"]
+
+# path, query string; "chat" runs against test/fakes.py so no network is needed
+SCENARIOS = {
+    "health": ("/health", {}),
+    "quote": ("/quote", {"token_in": "SUI", "token_out": "USDC", "amount_in": "10"}),
+    "intent": ("/chat", {"query": "swap 10 sui to usdc", "api_key": "bench"}),
+    "chat": ("/chat", {"query": "What is DeepBook?", "api_key": "bench"}),
+}
+
+# Runs in a fresh interpreter: import the app, serve one request, report timings
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path[:0] = [{backend!r}, {test_dir!r}]
+import app as backend
+imported = time.perf_counter()
+if {fakes!r}:
+    import fakes
+    fakes.install()
+response = backend.app.test_client().get({path!r}, query_string={params!r})
+done = time.perf_counter()
+print(json.dumps({{
+    "status": response.status_code,
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (done - start) * 1000,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run_once(scenario, env):
+    path, params = SCENARIOS[scenario]
+    code = CHILD.format(backend=BACKEND, test_dir=TEST_DIR, fakes=scenario == "chat", path=path,
+                        params=params, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", code], env=env, text=True)
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main(argv=None):
+    """
+    Cold-start cost of the Flask app: each run is a fresh interpreter that
+    imports app.py and serves exactly one request. Reports the median import
+    time, time to first response (import + request, in-process) and total
+    process time, plus which heavy dependencies each path ended up loading.
+    """
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-first-response per path.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="coldstart-")
+    env = dict(os.environ, LOG_LEVEL="WARNING", SEARCH_CACHE_PATH=os.path.join(scratch, "search_cache.sqlite3"))
+
+    print(f"{'path':<8} {'status':>6} {'import ms':>10} {'first resp ms':>14} {'process ms':>11}  loaded")
+    for scenario in args.scenarios.split(","):
+        runs = [run_once(scenario, env) for _ in range(args.runs)]
+        median = lambda key: statistics.median(r[key] for r in runs)
+        print(f"{scenario:<8} {runs[-1]['status']:>6} {median('import_ms'):>10.1f} {median('first_response_ms'):>14.1f} "
+              f"{median('process_ms'):>11.1f}  {','.join(runs[-1]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+import executors
+from image import CARD_SIZES, ImageProxy, ImageStore, local_fetcher
+
+# name -> (size, format, mode); roughly what search results link to
+SOURCES = {
+    "photo.jpg": ((1920, 1080), "JPEG", "RGB"),
+    "hqdefault.jpg": ((480, 360), "JPEG", "RGB"),
+    "diagram.png": ((1600, 1200), "PNG", "RGBA"),
+    "poster.webp": ((2400, 3200), "WEBP", "RGB"),
+}
+
+
+def make_source(path, size, fmt, mode):
+    """A synthetic picture with gradients and shapes, so it doesn't compress to nothing."""
+    image = Image.new(mode, size)
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    for x in range(0, width, 4):
+        draw.line([(x, 0), (x, height)], fill=(x * 255 // width, 120, 255 - x * 255 // width) + ((255,) if mode == "RGBA" else ()))
+    for i in range(40):
+        box = [i * width // 40, i * height // 60, i * width // 40 + width // 8, i * height // 60 + height // 8]
+        draw.ellipse(box, fill=(255 - i * 5, i * 6, 90) + ((160,) if mode == "RGBA" else ()))
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=90) if fmt != "PNG" else image.save(buffer, fmt)
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+    return len(buffer.getvalue())
+
+
+def main(warm_calls=2000):
+    """
+    Render each local source through ImageProxy (fetch once, every card size,
+    disk cache) and report cold render time, warm serve time and the bytes a
+    card downloads before and after.
+    """
+    scratch = tempfile.mkdtemp(prefix="bench-images-")
+    sources = os.path.join(scratch, "sources")
+    os.makedirs(sources)
+    original = {name: make_source(os.path.join(sources, name), *spec) for name, spec in SOURCES.items()}
+
+    store = ImageStore(os.path.join(scratch, "cache"))
+    proxy = ImageProxy(store, executors.images, fetch=local_fetcher(sources))
+
+    header = "".join(f"{size + ' bytes':>10}" for size in CARD_SIZES)
+    print(f"{'source':<14} {'orig bytes':>10} {header} {'cold ms':>8} {'warm us':>8}")
+    for name in SOURCES:
+        url = f"https://assets.example.com/{name}"
+        start = time.perf_counter()
+        proxy.get(url, "md")
+        cold = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(warm_calls):
+            proxy.get(url, "md")
+        warm = (time.perf_counter() - start) / warm_calls * 1e6
+
+        sizes = "".join(f"{len(proxy.get(url, size)[2]):>10}" for size in CARD_SIZES)
+        print(f"{name:<14} {original[name]:>10} {sizes} {cold:>8.1f} {warm:>8.1f}")
+
+    print(proxy.stats())
+
+
+if __name__ == "__main__":
+    main()
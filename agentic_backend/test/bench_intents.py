@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from intents import classify_intent
+from legacy_intents import legacy_classify
+
+CORPUS_PATH = os.path.join(HERE, "intent_corpus.json")
+
+
+def time_per_query(fn, queries, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            fn(q)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(queries)) * 1e6
+
+
+def main(rounds=2000):
+    """
+    Check classify_intent against the labels in intent_corpus.json and against
+    the original /chat regex stages (frozen in legacy_intents.py), then time
+    both. Differences from baseline are errors unless the label sides with
+    classify_intent (a baseline bug that was fixed).
+    """
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)
+
+    errors = 0
+    for item in corpus:
+        intent = classify_intent(item["query"])
+        kind = intent.kind if intent else None
+        correct = kind == item["kind"] and (intent is None or intent.order_type == item.get("order_type"))
+        if not correct:
+            errors += 1
+            print(f"MISLABELLED: {item['query']!r} -> {kind} {intent and intent.order_type}, expected {item['kind']} {item.get('order_type')}")
+        legacy = legacy_classify(item["query"])
+        if intent != legacy:
+            if correct:
+                print(f"FIXED vs baseline: {item['query']!r} -> {legacy}")
+            else:
+                errors += 1
+                print(f"MISMATCH vs baseline: {item['query']!r} -> {legacy}")
+
+    groups = {
+        "all": [c["query"] for c in corpus],
+        "intent": [c["query"] for c in corpus if c["kind"]],
+        "free-form": [c["query"] for c in corpus if not c["kind"]],
+    }
+    # The baseline also printed a line per pattern tried; the frozen copy doesn't, so it is flattered here
+    print(f"{'set':<10} {'queries':>7} {'baseline us/q':>14} {'engine us/q':>12}")
+    for name, queries in groups.items():
+        legacy = time_per_query(legacy_classify, queries, rounds)
+        engine = time_per_query(classify_intent, queries, rounds)
+        print(f"{name:<10} {len(queries):>7} {legacy:>14.2f} {engine:>12.2f}")
+
+    return errors
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from quote_engine import QuoteEngine, default_snapshot_path
+
+PAIRS = [("SUI", "USDC"), ("USDC", "SUI"), ("DEEP", "USDC"), ("WAL", "DEEP")]
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(calls=5000, batch=500):
+    """
+    Per-quote cost of the order-book engine: single /quote calls, a batch of
+    `batch` amounts for one pair (the keystroke case), and the raw vectorized
+    fill without building response dicts.
+    """
+    engine = QuoteEngine.from_snapshot(default_snapshot_path())
+    rng = np.random.default_rng(0)
+    amounts = rng.uniform(1, 5000, batch)
+
+    print(f"{'pair':<12} {'route':<16} {'single us':>10} {'batch us/q':>11} {'vector us/q':>12}")
+    for token_in, token_out in PAIRS:
+        route = "->".join(engine.quote(token_in, token_out, "10")["route"])
+        single = per_call_us(lambda: engine.quote(token_in, token_out, "123.45"), calls)
+        requests = [(token_in, token_out, a) for a in amounts]
+        batched = per_call_us(lambda: engine.quote_batch(requests), calls // 100) / batch
+        vector = per_call_us(lambda: engine.quote_many(token_in, token_out, amounts), calls // 10) / batch
+        print(f"{token_in + '/' + token_out:<12} {route:<16} {single:>10.1f} {batched:>11.2f} {vector:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Through the real /chat cache path (pipeline.cached_answer), with no network or LLM calls
+os.environ["ANSWER_CACHE"] = "1"
+os.environ.setdefault("CONVERSATION_COMPACTION", "0")
+os.environ.setdefault("SUGGESTION_PREFETCH", "0")
+
+import pipeline
+from router import LEARN, RouteDecision
+
+# Each group: the question that gets cached, then rephrasings that should reuse it
+PARAPHRASES = [
+    ["What is SuiTent?", "what is suitent", "What's SuiTent??", "tell me what SuiTent is", "explain suitent"],
+    ["How does DeepBook work?", "how does deepbook work", "How does the DeepBook work", "explain how deepbook works"],
+    ["Explain PTBs", "explain ptbs", "what are PTBs?", "Tell me about PTBs"],
+    ["What is Move language?", "what is the move language", "explain Move language", "Move language?"],
+    ["What is Solidity?", "what is solidity", "explain solidity"],
+    ["How do I create a wallet?", "how to create a wallet", "how do i create a wallet?"],
+    ["What is a smart contract?", "what is a smart contract", "What's a smart contract?", "explain smart contracts"],
+]
+# Prices are attached to these turns, so their answers are never stored or served
+LIVE = [
+    "What is the SUI price?", "what is the sui price", "How is the crypto market today?", "bitcoin trend this week",
+    "should I buy sui now", "How do I stake on Sui?", "Explain Sui Move",
+]
+# Distinct questions that must not be answered with one another's reply
+DISTINCT = [
+    "What is Sui?", "What is DeepBook?", "What is a validator?", "How do NFTs work?",
+    "What is liquidity mining?", "Explain zkLogin", "What is a Move object?", "How do wallets work?",
+    "What are gas fees on Sui?", "Explain consensus in Sui", "What is an oracle?", "What is DeFi?",
+]
+# Near-identical wording, different meaning: checked on the cache itself, since
+# the coin names in them would keep pipeline.cached_answer from looking them up
+NEAR_MISSES = [
+    ("How do I stake SUI using the Sui wallet browser extension", "How do I unstake SUI using the Sui wallet browser extension"),
+    ("is it safe to bridge usdc from ethereum to sui", "is it safe to bridge usdt from ethereum to sui"),
+    ("should I buy sui now", "should I not buy sui now"),
+]
+
+
+_conversations = itertools.count()
+
+
+def answer_first_turn(query):
+    """
+    What /chat does with a fresh LEARN question: assemble the turn (prices
+    attached whenever wants_market_data says so) and store the reply if the
+    turn was marked cacheable.
+    """
+    market = pipeline.MarketData({"sui": {"usd": 1.0}}, 0.0) if pipeline.wants_market_data(query) else None
+    route = RouteDecision(LEARN, 1.0, "local")
+    _, meta = pipeline.assemble_turn(query, f"eval-{next(_conversations)}", None, market, route, None, None)
+    pipeline.remember_answer(query, "", {"answer": query, "meta": meta})
+
+
+def cached(query):
+    return pipeline.cached_answer(query, f"eval-{next(_conversations)}")
+
+
+def main():
+    """
+    Offline check of the answer cache as /chat uses it: rephrasings of a
+    cached question should hit, unrelated or one-word-different questions
+    should not, and market-dependent questions are neither stored nor
+    served. Also times hits and misses.
+    """
+    cache = pipeline.answer_cache
+    version = pipeline.SYSTEM_PROMPT_VERSION
+    for group in PARAPHRASES:
+        answer_first_turn(group[0])
+    for query in LIVE:
+        answer_first_turn(query)
+
+    missed = wrong = 0
+    for group in PARAPHRASES:
+        for query in group[1:]:
+            hit = cached(query)
+            if hit is None:
+                missed += 1
+                print(f"MISS: {query!r} (cached: {group[0]!r})")
+            elif hit["answer"] != group[0]:
+                wrong += 1
+                print(f"WRONG: {query!r} -> {hit['answer']!r}")
+    false_hits = 0
+    for query in DISTINCT + LIVE:
+        hit = cached(query)
+        if hit is not None:
+            false_hits += 1
+            print(f"FALSE HIT: {query!r} -> {hit['answer']!r} ({hit['meta']['answer_cache']['similarity']})")
+    for stored, query in NEAR_MISSES:
+        cache.put(stored, version, "{}", "")
+        hit = cache.get(query, version)
+        if hit is not None:
+            false_hits += 1
+            print(f"FALSE HIT: {query!r} -> {stored!r} ({hit[2]})")
+
+    rounds = 2000
+    hits = [q for group in PARAPHRASES for q in group[1:]]
+    start = time.perf_counter()
+    for _ in range(rounds // 10):
+        for q in hits:
+            cache.get(q, version)
+    hit_us = (time.perf_counter() - start) / (rounds // 10 * len(hits)) * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds // 10):
+        for q in DISTINCT:
+            cache.get(q, version)
+    miss_us = (time.perf_counter() - start) / (rounds // 10 * len(DISTINCT)) * 1e6
+
+    paraphrases = sum(len(g) - 1 for g in PARAPHRASES)
+    print(f"paraphrase recall:   {(paraphrases - missed - wrong) / paraphrases:.1%} ({paraphrases} queries)")
+    print(f"false hits:          {false_hits}/{len(DISTINCT) + len(LIVE) + len(NEAR_MISSES)}")
+    print(f"lookup (hit):        {hit_us:.1f} us")
+    print(f"lookup (miss):       {miss_us:.1f} us")
+    return wrong + false_hits
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import classify_route
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The weights were tuned on router_queries.json; router_holdout.json was not looked at while tuning
+QUERY_SETS = {
+    "tuning": os.path.join(HERE, "router_queries.json"),
+    "held-out": os.path.join(HERE, "router_holdout.json"),
+}
+
+
+def evaluate(name, path, threshold):
+    """
+    Offline evaluation of the local LEARN/CHAT router against one labelled set.
+    Reports overall accuracy, how many queries clear the confidence threshold
+    (and so skip the 8B model), and accuracy on that confident subset.
+    Returns the number of confident misses.
+    """
+    with open(path) as f:
+        labelled = json.load(f)
+
+    correct = confident = confident_correct = 0
+    for item in labelled:
+        decision = classify_route(item["query"])
+        ok = decision.label == item["label"]
+        correct += ok
+        if decision.confidence >= threshold:
+            confident += 1
+            confident_correct += ok
+            if not ok:
+                print(f"CONFIDENT MISS: {item['query']!r} -> {decision.label} ({decision.confidence})")
+
+    start = time.perf_counter()
+    rounds = 200
+    for _ in range(rounds):
+        for item in labelled:
+            classify_route(item["query"])
+    per_query_us = (time.perf_counter() - start) / (rounds * len(labelled)) * 1e6
+
+    total = len(labelled)
+    print(f"[{name}] {os.path.basename(path)}")
+    print(f"queries:             {total}")
+    print(f"accuracy:            {correct / total:.1%}")
+    print(f"handled locally:     {confident / total:.1%} (confidence >= {threshold})")
+    print(f"accuracy when local: {confident_correct / confident:.1%}" if confident else "accuracy when local: n/a")
+    print(f"cost per query:      {per_query_us:.1f} us")
+    return confident - confident_correct
+
+
+def main(threshold=float(os.environ.get("ROUTER_CONFIDENCE", 0.85))):
+    return sum(evaluate(name, path, threshold) for name, path in QUERY_SETS.items())
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,176 @@
+"""
+Local stand-ins for Groq (ChatGroq), DuckDuckGo (DDGS) and the CoinGecko
+price endpoint, with injectable latency and failure rates, for offline
+benchmarks. install() patches them into llm_pool and tools.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class FakeUpstreamError(Exception):
+    pass
+
+
+class Latency:
+    """Delay of `mean` seconds (+/- `jitter` as a fraction), failing with probability `failure_rate`."""
+
+    def __init__(self, mean=0.0, jitter=0.25, failure_rate=0.0, seed=None):
+        self.mean = mean
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay in seconds, whether this call fails)."""
+        with self._lock:
+            delay = self.mean * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            return max(delay, 0.0), self._rng.random() < self.failure_rate
+
+    def wait(self, name):
+        delay, fail = self.draw()
+        time.sleep(delay)
+        if fail:
+            raise FakeUpstreamError(f"injected {name} failure")
+
+    async def await_(self, name):
+        delay, fail = self.draw()
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeUpstreamError(f"injected {name} failure")
+
+
+CHAT_WORDS = re.compile(r"\b(hi|hello|hey|thanks|thank you|how are you|good morning|gm|bye|lol)\b")
+
+REPLY = {
+    "html_response": "<div class='p-3 rounded-xl bg-slate-800'>Here is a quick overview.</div>",
+    "messages": [
+        {"text": "Great question! Let me walk you through it step by step.", "facialExpression": "smile",
+         "animation": "Talking_1", "assets": [{"type": "youtube", "url": "https://youtube.com/watch?v=x", "caption": "Intro video explainer"}]},
+        {"text": "The short version is that it is fast, cheap and built for builders.", "facialExpression": "default",
+         "animation": "Talking_2", "assets": [{"type": "docs", "url": "https://docs.sui.io", "caption": "Official Sui docs"}]},
+    ],
+    "suggestions": ["How does staking work?", "What is DeepBook?", "Explain Move objects"],
+}
+
+
+class FakeChatGroq:
+    """Drop-in for langchain_groq.ChatGroq: routes, summarizes or answers in the app's JSON format."""
+
+    # model name -> Latency; set by install()
+    latencies = {}
+
+    def __init__(self, model=None, api_key=None, http_client=None, **kwargs):
+        self.model_name = model
+        self.latency = self.latencies.get(model) or Latency()
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        if "Decision (LEARN/CHAT)" in prompt:
+            query = prompt.split('"')[1] if '"' in prompt else prompt
+            content = "CHAT" if CHAT_WORDS.search(query.lower()) else "LEARN"
+        elif "Classify the intent of each numbered user message" in prompt:
+            numbered = re.findall(r"^\s*(\d+)\. (.*)$", prompt, re.MULTILINE)
+            content = "\n".join(
+                f"{n}: {'CHAT' if CHAT_WORDS.search(query.lower()) else 'LEARN'}" for n, query in numbered
+            )
+        elif "Update the running summary" in prompt:
+            content = "The user is learning about Sui, DeFi and trading; keep answers short."
+        else:
+            content = json.dumps(REPLY)
+        prompt_tokens = sum(len(m.content) for m in messages) // 4
+        return content, {"input_tokens": prompt_tokens, "output_tokens": len(content) // 4,
+                         "total_tokens": prompt_tokens + len(content) // 4}
+
+    def invoke(self, messages, **kwargs):
+        self.latency.wait(self.model_name)
+        content, usage = self._reply(messages)
+        return AIMessage(content=content, usage_metadata=usage)
+
+    async def ainvoke(self, messages, **kwargs):
+        await self.latency.await_(self.model_name)
+        content, usage = self._reply(messages)
+        return AIMessage(content=content, usage_metadata=usage)
+
+    def stream(self, messages, **kwargs):
+        delay, fail = self.latency.draw()
+        content, usage = self._reply(messages)
+        pieces = [content[i:i + 24] for i in range(0, len(content), 24)]
+        for i, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            if fail and i == len(pieces) // 2:
+                raise FakeUpstreamError(f"injected {self.model_name} failure")
+            last = i == len(pieces) - 1
+            yield AIMessageChunk(content=piece, usage_metadata=usage if last else None)
+
+
+class FakeDDGS:
+    """Drop-in for duckduckgo_search.DDGS (videos, text, images)."""
+
+    latency = Latency()
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+
+    def videos(self, query, max_results=2):
+        self.latency.wait("ddgs")
+        return [{"title": f"{query} video {i}", "content": f"https://youtube.com/watch?v={i}",
+                 "images": {"large": f"https://i.ytimg.com/vi/{i}/hqdefault.jpg"}} for i in range(max_results)]
+
+    def text(self, query, max_results=3):
+        self.latency.wait("ddgs")
+        return [{"title": f"{query} result {i}", "href": f"https://example.com/{i}",
+                 "body": "A short snippet about " + query} for i in range(max_results)]
+
+    def images(self, query, max_results=2, **kwargs):
+        self.latency.wait("ddgs")
+        return [{"title": f"{query} image {i}", "image": f"https://example.com/{i}.png",
+                 "thumbnail": f"https://example.com/{i}_t.png"} for i in range(max_results)]
+
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class FakeCoinGecko:
+    """Stands in for the `requests` module as tools.py uses it (CoinGecko simple/price)."""
+
+    latency = Latency()
+    prices = {"bitcoin": 65000.0, "ethereum": 3200.0, "sui": 3.5, "solana": 150.0}
+
+    def get(self, url, params=None, timeout=None):
+        self.latency.wait("coingecko")
+        ids = (params or {}).get("ids", "").split(",")
+        currency = (params or {}).get("vs_currencies", "usd")
+        return _FakeResponse({
+            i: {currency: self.prices[i], f"{currency}_24h_change": 1.5} for i in ids if i in self.prices
+        })
+
+
+def install(llm=None, router=None, search=None, prices=None):
+    """Patch the fakes into the already-imported backend modules."""
+    import llm_pool
+    import tools
+
+    FakeChatGroq.latencies = {
+        "llama-3.3-70b-versatile": llm or Latency(),
+        "llama-3.1-8b-instant": router or Latency(),
+    }
+    FakeDDGS.latency = search or Latency()
+    FakeCoinGecko.latency = prices or Latency()
+    llm_pool.ChatGroq = FakeChatGroq
+    tools.DDGS = FakeDDGS
+    tools.requests = FakeCoinGecko()
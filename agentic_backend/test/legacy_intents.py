@@ -0,0 +1,121 @@
+import re
+
+from intents import SWAP, TP_SL, PRICE_CHECK, Intent
+
+# Frozen copy of the regex stages of the original /chat handler (the
+# repository's first commit), for bench_intents.py to compare against.
+# Logic and patterns are verbatim; debug prints and the Flask responses are
+# replaced by returning the Intent the response carried. Do not "fix" this.
+
+SWAP_PATTERNS = [
+    r'swap\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
+    r'swap\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
+    r'trade\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
+    r'trade\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
+    r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
+    r'exchange\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
+    r'convert\s+(\d*\.?\d+)\s+(\w+)\s+to\s+(\w+)',
+    r'convert\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
+    # Additional patterns for more natural language
+    r'sell\s+(\d*\.?\d+)\s+(\w+)\s+for\s+(\w+)',
+    r'buy\s+(\w+)\s+with\s+(\d*\.?\d+)\s+(\w+)',  # Special case: buy TOKEN with AMOUNT TOKEN
+    r'get\s+(\w+)\s+for\s+(\d*\.?\d+)\s+(\w+)'   # Special case: get TOKEN for AMOUNT TOKEN
+]
+
+TP_SL_PATTERNS = [
+    # Take Profit patterns (with optional spaces around %)
+    r'(?:create|set).*take\s*profit.*?at\s*(\d+)\s*%',
+    r'take\s*profit.*?at\s*(\d+)\s*%',
+    r'tp.*?at\s*(\d+)\s*%',
+    r'take\s*profit.*?(\d+)\s*percent',
+    r'set.*?tp.*?(\d+)\s*%',
+    # Stop Loss patterns (with optional spaces around %)
+    r'(?:create|set).*stop\s*loss.*?at\s*(\d+)\s*%',
+    r'stop\s*loss.*?at\s*(\d+)\s*%',
+    r'sl.*?at\s*(\d+)\s*%',
+    r'stop\s*loss.*?(\d+)\s*percent',
+    r'set.*?sl.*?(\d+)\s*%',
+    # More flexible patterns
+    r'(?:take\s*profit|tp).*?(\d+)\s*%.*?(?:current|price)',
+    r'(?:stop\s*loss|sl).*?(\d+)\s*%.*?(?:current|price)'
+]
+
+PRICE_CHECK_PATTERNS = [
+    r'what.*current.*price.*(\w+)',
+    r'current.*price.*(\w+)',
+    r'price.*of.*(\w+)',
+    r'(\w+).*price.*now',
+    r'show.*price.*(\w+)',
+    r'get.*price.*(\w+)'
+]
+
+TOKEN_MAPPINGS = {
+    'DEEP': 'DEEP',
+    'SUI': 'SUI',
+    'USDC': 'USDC',
+    'USDT': 'USDT',
+    'BTC': 'BTC',
+    'ETH': 'ETH',
+    'WETH': 'WETH'
+}
+
+
+def legacy_classify(query):
+    """The Intent the original /chat answered `query` with, or None if it went on to the router."""
+    query_lower = query.lower()
+
+    for i, pattern in enumerate(SWAP_PATTERNS):
+        match = re.search(pattern, query_lower)
+        if match:
+            try:
+                # Handle different patterns that have different group orders
+                if i == 9:  # "buy TOKEN with AMOUNT TOKEN" pattern
+                    to_token = match.group(1).upper() if match.group(1) else "UNKNOWN"
+                    amount = match.group(2) if match.group(2) else "0"
+                    from_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
+                elif i == 10:  # "get TOKEN for AMOUNT TOKEN" pattern
+                    to_token = match.group(1).upper() if match.group(1) else "UNKNOWN"
+                    amount = match.group(2) if match.group(2) else "0"
+                    from_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
+                else:  # Standard patterns: "swap AMOUNT FROM to TO"
+                    amount = match.group(1) if match.group(1) else "0"
+                    from_token = match.group(2).upper() if match.group(2) else "UNKNOWN"
+                    to_token = match.group(3).upper() if match.group(3) else "UNKNOWN"
+
+                if not amount or not from_token or not to_token:
+                    continue
+
+                from_token = TOKEN_MAPPINGS.get(from_token, from_token)
+                to_token = TOKEN_MAPPINGS.get(to_token, to_token)
+                return Intent(SWAP, amount=amount, from_token=from_token, to_token=to_token)
+            except Exception:
+                continue
+
+    for i, pattern in enumerate(TP_SL_PATTERNS):
+        match = re.search(pattern, query_lower)
+        if match:
+            try:
+                percentage = match.group(1)
+
+                # Determine if it's take profit or stop loss based on keywords
+                is_take_profit = any(keyword in query_lower for keyword in ['take profit', 'tp', 'profit'])
+                is_stop_loss = any(keyword in query_lower for keyword in ['stop loss', 'sl', 'stop'])
+
+                # Default to take profit if both or neither are detected
+                if not is_stop_loss:
+                    is_take_profit = True
+
+                order_type = "take_profit" if is_take_profit else "stop_loss"
+                return Intent(TP_SL, percentage=percentage, order_type=order_type)
+            except Exception:
+                continue
+
+    for i, pattern in enumerate(PRICE_CHECK_PATTERNS):
+        match = re.search(pattern, query_lower)
+        if match:
+            try:
+                return Intent(PRICE_CHECK, token=match.group(1).upper())
+            except Exception:
+                continue
+
+    return None
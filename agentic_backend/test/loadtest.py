@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+TOKENS = ["SUI", "USDC", "DEEP", "WAL", "ETH", "BTC", "SOL"]
+TOPICS = ["DeepBook", "Move objects", "PTBs", "zkLogin", "Sui staking", "liquidity pools", "DeFi lending",
+          "NFT royalties", "validators", "gas fees", "oracles", "Walrus storage", "sponsored transactions"]
+TEMPLATES = ["What is {}?", "How does {} work?", "Explain {} to a beginner", "Tell me about {}", "Why does {} matter?"]
+CHATTER = ["Hi!", "Hello there", "How are you?", "Thanks a lot", "good morning", "lol nice", "Hey, what's up?"]
+
+DEFAULT_MIX = "swap=1,tp_sl=1,price_check=1,chat=2,learn=4,conversation=1"
+
+
+def make_query(path, rng):
+    if path == "swap":
+        return f"swap {rng.choice([0.5, 1, 10, 250])} {rng.choice(TOKENS).lower()} to {rng.choice(TOKENS).lower()}"
+    if path == "tp_sl":
+        kind = rng.choice(["take profit", "stop loss"])
+        return f"set a {kind} at {rng.randint(2, 40)}%"
+    if path == "price_check":
+        return f"what's the price of {rng.choice(TOKENS).lower()}"
+    if path == "chat":
+        return rng.choice(CHATTER)
+    return rng.choice(TEMPLATES).format(rng.choice(TOPICS))
+
+
+def is_error(response):
+    if response.status_code >= 400:
+        return True
+    body = response.get_json(silent=True) or {}
+    messages = body.get("messages") or [{}]
+    return "error" in body or str(messages[0].get("text", "")).startswith("Error:")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, text=True).strip()
+    except Exception:
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of the /chat backend against local fakes.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="work items; a conversation item is several turns")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="path=weight list")
+    parser.add_argument("--turns", type=int, default=8, help="turns per long conversation")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream instead of /chat")
+    parser.add_argument("--llm-latency", type=float, default=0.25)
+    parser.add_argument("--router-latency", type=float, default=0.03)
+    parser.add_argument("--search-latency", type=float, default=0.15)
+    parser.add_argument("--prices-latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="loadtest_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the Flask app in-process against fake Groq/DDGS/CoinGecko and drive a
+    mixed workload at fixed concurrency. Writes per-path throughput and
+    p50/p95/p99 latencies to --out as JSON for diffing between versions.
+    """
+    args = parse_args(argv)
+
+    # Isolate caches and keep logs quiet before the backend is imported
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["SEARCH_CACHE_PATH"] = os.path.join(scratch, "search_cache.sqlite3")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # The fakes don't throttle; lift the per-provider rate limits unless set explicitly
+    for name in ("DDGS", "COINGECKO"):
+        os.environ.setdefault(f"{name}_RATE", "10000")
+        os.environ.setdefault(f"{name}_BURST", "10000")
+
+    import app as backend
+    import fakes
+
+    fakes.install(
+        llm=fakes.Latency(args.llm_latency, failure_rate=args.failure_rate, seed=args.seed),
+        router=fakes.Latency(args.router_latency, failure_rate=args.failure_rate, seed=args.seed + 1),
+        search=fakes.Latency(args.search_latency, failure_rate=args.failure_rate, seed=args.seed + 2),
+        prices=fakes.Latency(args.prices_latency, failure_rate=args.failure_rate, seed=args.seed + 3),
+    )
+
+    mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+    rng = random.Random(args.seed)
+    work = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+    endpoint = "/chat/stream" if args.stream else "/chat"
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def request(path, query, conversation_id):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = backend.app.test_client()
+        params = {"query": query, "api_key": "loadtest", "conversation_id": conversation_id}
+        start = time.perf_counter()
+        response = client.get(endpoint, query_string=params)
+        if args.stream:
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+            failed = response.status_code >= 400 or not lines or "Error:" in json.dumps(lines[-1].get("data", {}))[:200]
+        else:
+            failed = is_error(response)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[path].append(elapsed)
+            errors[path] += failed
+
+    def run(item):
+        index, path = item
+        item_rng = random.Random(args.seed * 1000003 + index)
+        conversation_id = f"loadtest-{args.seed}-{index}"
+        if path == "conversation":
+            for _ in range(args.turns):
+                request(path, make_query(item_rng.choice(["learn", "learn", "chat"]), item_rng), conversation_id)
+        else:
+            request(path, make_query(path, item_rng), conversation_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, enumerate(work)))
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    report = {
+        "version": git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "paths": {path: summarize(latencies[path], errors[path], elapsed) for path in sorted(latencies)},
+        # Local rate limiting and breaker trips against the fakes show up here
+        "upstreams": backend.upstream.stats(),
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    print(f"{'path':<14} {'reqs':>6} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for path, stats in list(report["paths"].items()) + [("overall", report["overall"])]:
+        print(f"{path:<14} {stats['requests']:>6} {stats['errors']:>6} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print(f"wrote {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
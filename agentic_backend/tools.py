@@ -1,92 +1,275 @@
-import requests
+import asyncio
+import logging
+import os
+import threading
+import executors
+import upstream
+from executors import Saturated
+from upstream import UpstreamUnavailable
+from price_cache import PriceCache
+from metrics import stage
 
-def get_crypto_prices(ids="bitcoin,ethereum,sui,solana", vs_currencies="usd"):
+log = logging.getLogger(__name__)
+
+# Imported on first use so cold starts that never fetch prices or search skip them
+requests = None
+DDGS = None
+
+def _requests():
+    global requests
+    if requests is None:
+        import requests
+    return requests
+
+def _ddgs():
+    global DDGS
+    if DDGS is None:
+        from duckduckgo_search import DDGS
+    return DDGS
+
+def fetch_crypto_prices(ids, vs_currencies):
     """
-    Fetches cryptocurrency prices from CoinGecko API.
+    Fetches cryptocurrency prices from CoinGecko API (uncached).
     """
-    try:
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            "ids": ids,
-            "vs_currencies": vs_currencies,
-            "include_24hr_change": "true"
-        }
-        response = requests.get(url, params=params, timeout=5)
+    url = "https://api.coingecko.com/api/v3/simple/price"
+    params = {
+        "ids": ids,
+        "vs_currencies": vs_currencies,
+        "include_24hr_change": "true"
+    }
+
+    def fetch():
+        response = _requests().get(url, params=params, timeout=5)
+        # Inside the upstream call so 429s and 5xx count against the breaker
         response.raise_for_status()
         return response.json()
+
+    return upstream.coingecko.call(fetch)
+
+# Shared across requests so bursts of price questions hit CoinGecko once per TTL
+price_cache = PriceCache(
+    fetch_crypto_prices,
+    ttl=float(os.environ.get("PRICE_CACHE_TTL", 30)),
+    max_stale=float(os.environ.get("PRICE_CACHE_MAX_STALE", 300)),
+    executor=executors.prices,
+)
+
+def get_crypto_prices(ids="bitcoin,ethereum,sui,solana", vs_currencies="usd"):
+    """
+    Fetches cryptocurrency prices, served from the shared price cache.
+    """
+    return get_crypto_prices_with_age(ids, vs_currencies)[0]
+
+def get_crypto_prices_with_age(ids="bitcoin,ethereum,sui,solana", vs_currencies="usd"):
+    """
+    (prices, age in seconds) from the shared price cache; ({}, None) when
+    there is no price younger than PRICE_CACHE_MAX_STALE.
+    """
+    try:
+        prices, age = price_cache.get_with_age(ids, vs_currencies)
     except Exception as e:
-        print(f"Error fetching crypto prices: {e}")
-        return {}
+        log.warning("Error fetching crypto prices: %s", e)
+        return {}, None
+    return prices or {}, age
 
-from duckduckgo_search import DDGS
 import json
-from concurrent.futures import ThreadPoolExecutor
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from search_cache import SearchCache, default_cache_path
+
+# Shared by all requests; the SQLite tier keeps results across restarts
+search_cache = SearchCache(path=default_cache_path())
+
+# Overall budget for one search_web call, and the HTTP timeout for each category
+SEARCH_BUDGET = float(os.environ.get("SEARCH_BUDGET", 2.5))
+SEARCH_CATEGORY_TIMEOUT = float(os.environ.get("SEARCH_CATEGORY_TIMEOUT", 2))
 
 def search_videos(ddgs, query):
-    try:
-        y_results = list(ddgs.videos(f"site:youtube.com {query}", max_results=2))
-        return [{
-            "title": r.get("title"),
-            "url": r.get("content"),
-            "thumbnail": r.get("images", {}).get("large") or r.get("images", {}).get("medium") or r.get("images", {}).get("small")
-        } for r in y_results]
-    except: return []
+    y_results = list(ddgs.videos(f"site:youtube.com {query}", max_results=2))
+    return [{
+        "title": r.get("title"),
+        "url": r.get("content"),
+        "thumbnail": r.get("images", {}).get("large") or r.get("images", {}).get("medium") or r.get("images", {}).get("small")
+    } for r in y_results]
 
 def search_articles(ddgs, query):
-    try:
-        blog_query = f"(site:medium.com OR site:geeksforgeeks.org OR site:hashnode.com OR site:dev.to) {query}"
-        b_results = list(ddgs.text(blog_query, max_results=3))
-        return [{
-            "title": r.get("title"),
-            "url": r.get("href"),
-            "snippet": r.get("body"),
-            "source": "blog"
-        } for r in b_results]
-    except: return []
+    blog_query = f"(site:medium.com OR site:geeksforgeeks.org OR site:hashnode.com OR site:dev.to) {query}"
+    b_results = list(ddgs.text(blog_query, max_results=3))
+    return [{
+        "title": r.get("title"),
+        "url": r.get("href"),
+        "snippet": r.get("body"),
+        "source": "blog"
+    } for r in b_results]
 
 def search_docs(ddgs, query):
-    try:
-        doc_query = f"(site:docs.* OR site:*.gitbook.io OR filetype:pdf) {query} documentation"
-        d_results = list(ddgs.text(doc_query, max_results=2))
-        return [{
-            "title": r.get("title"),
-            "url": r.get("href"),
-            "snippet": r.get("body")
-        } for r in d_results]
-    except: return []
+    doc_query = f"(site:docs.* OR site:*.gitbook.io OR filetype:pdf) {query} documentation"
+    d_results = list(ddgs.text(doc_query, max_results=2))
+    return [{
+        "title": r.get("title"),
+        "url": r.get("href"),
+        "snippet": r.get("body")
+    } for r in d_results]
 
 def search_images(ddgs, query):
-    try:
-        i_results = list(ddgs.images(query, max_results=4, safesearch="on"))
-        return [{
-            "title": r.get("title"),
-            "url": r.get("image"),
-            "thumbnail": r.get("thumbnail")
-        } for r in i_results]
-    except: return []
+    i_results = list(ddgs.images(query, max_results=4, safesearch="on"))
+    return [{
+        "title": r.get("title"),
+        "url": r.get("image"),
+        "thumbnail": r.get("thumbnail")
+    } for r in i_results]
+
+_sessions = threading.local()
+
+def ddgs_session(timeout):
+    """
+    Long-lived DDGS session for the current search worker thread.
+    DDGS's timeout applies to each HTTP request, i.e. each category.
+    """
+    sessions = getattr(_sessions, "by_timeout", None)
+    if sessions is None:
+        sessions = _sessions.by_timeout = {}
+    if timeout not in sessions:
+        sessions[timeout] = _ddgs()(timeout=timeout)
+    return sessions[timeout]
+
+def run_searcher(category, query, timeout, stage_prefix="search_"):
+    """
+    One category search through the shared DuckDuckGo upstream. Errors, local
+    rate limiting and an open circuit breaker all come back as no results.
+    """
+    with stage(stage_prefix + category):
+        try:
+            results = upstream.ddgs.call(SEARCHERS[category], ddgs_session(timeout), query)
+        except UpstreamUnavailable as e:
+            log.debug("Skipping %s search: %s", category, e)
+            return []
+        except Exception as e:
+            log.warning("Search error in %s: %s", category, e)
+            return []
+    if results:
+        search_cache.put(category, query, results)
+    return results
+
+SEARCHERS = {
+    "videos": search_videos,
+    "articles": search_articles,
+    "docs": search_docs,
+    "images": search_images,
+}
+
+def cached_results(query):
+    """Split the categories into ones served from the search cache and ones still to search."""
+    results = {"videos": [], "articles": [], "images": [], "docs": []}
+    missing = []
+    for category in SEARCHERS:
+        cached = search_cache.get(category, query)
+        if cached is None:
+            missing.append(category)
+        else:
+            results[category] = cached
+    return results, missing
 
 def search_web(query, max_results=8):
     """
     Find actual URLs for diverse assets using Parallel DuckDuckGo search.
+    Categories already in the search cache are not searched again.
     """
-    results = {"videos": [], "articles": [], "images": [], "docs": []}
-    
+    results, _ = search_web_partial(query)
+    return results
+
+def search_web_partial(query, budget=SEARCH_BUDGET, category_timeout=SEARCH_CATEGORY_TIMEOUT, cancel=None):
+    """
+    search_web with a latency budget. Returns (results, dropped) where `results`
+    holds every category that finished within `budget` seconds and `dropped`
+    lists the ones that did not. Setting the `cancel` event stops waiting early.
+    Searches still in flight are abandoned, never waited on.
+    """
+    results, missing = cached_results(query)
+    if not missing:
+        return results, []
+
+    futures = {}
     try:
-        with DDGS() as ddgs:
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                # Dispatch all searches in parallel
-                future_v = executor.submit(search_videos, ddgs, query)
-                future_a = executor.submit(search_articles, ddgs, query)
-                future_d = executor.submit(search_docs, ddgs, query)
-                future_i = executor.submit(search_images, ddgs, query)
-                
-                # Collect results as they finish
-                results["videos"] = future_v.result()
-                results["articles"] = future_a.result()
-                results["docs"] = future_d.result()
-                results["images"] = future_i.result()
-                
-        return results
+        # Dispatch all uncached searches in parallel on the shared search pool
+        for category in missing:
+            futures[executors.search.submit(run_searcher, category, query, category_timeout)] = category
+        pending = set(futures)
+        deadline = time.monotonic() + budget
+
+        # Collect results as they finish, until the budget runs out or we're cancelled
+        while pending and not (cancel is not None and cancel.is_set()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Poll so a cancel is noticed promptly
+            timeout = min(remaining, 0.05) if cancel is not None else remaining
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+    except Saturated:
+        for future in futures:
+            future.cancel()
+        raise
     except Exception as e:
-        print(f"Parallel Search error: {e}")
-        return results
\ No newline at end of file
+        log.error("Parallel Search error: %s", e)
+        pending = set()
+
+    # Whatever is still queued is not worth starting; running searches still fill the cache
+    for future in pending:
+        future.cancel()
+    dropped = [futures[future] for future in pending]
+    if dropped:
+        log.info("Search dropped categories: %s", dropped)
+    return results, dropped
+
+async def search_web_partial_async(query, budget=SEARCH_BUDGET, category_timeout=SEARCH_CATEGORY_TIMEOUT, cancel=None):
+    """
+    search_web_partial for the event loop. Categories still run on the shared
+    search pool; the coroutine awaits them without holding a thread.
+    `cancel` is an asyncio.Event.
+    """
+    # SQLite tier and its lock: off the loop
+    results, missing = await asyncio.to_thread(cached_results, query)
+    if not missing:
+        return results, []
+
+    futures = {}
+    try:
+        for category in missing:
+            future = executors.search.submit(run_searcher, category, query, category_timeout)
+            futures[asyncio.wrap_future(future)] = (category, future)
+    except Saturated:
+        for _, future in futures.values():
+            future.cancel()
+        raise
+
+    # Resolves when the caller cancels, waking the wait below
+    cancelled = asyncio.ensure_future(cancel.wait()) if cancel is not None else None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+
+    pending = set(futures)
+    while pending and not (cancel is not None and cancel.is_set()):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        done, _ = await asyncio.wait(pending | ({cancelled} if cancelled else set()),
+                                     timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in done:
+            if waiter is cancelled:
+                continue
+            pending.discard(waiter)
+            try:
+                results[futures[waiter][0]] = waiter.result()
+            except Exception as e:
+                log.warning("Search error in %s: %s", futures[waiter][0], e)
+
+    if cancelled is not None and not cancelled.done():
+        cancelled.cancel()
+    for waiter in pending:
+        futures[waiter][1].cancel()
+    dropped = [futures[waiter][0] for waiter in pending]
+    if dropped:
+        log.info("Search dropped categories: %s", dropped)
+    return results, dropped
@@ -0,0 +1,266 @@
+import csv
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+TAKE_PROFIT = "take_profit"
+STOP_LOSS = "stop_loss"
+
+# CoinGecko ids returned by tools.get_crypto_prices -> token symbols
+COINGECKO_SYMBOLS = {"bitcoin": "BTC", "ethereum": "ETH", "sui": "SUI", "solana": "SOL"}
+
+
+class Order:
+    __slots__ = ("id", "token", "order_type", "trigger_price", "reference_price", "percentage", "owner", "created", "active")
+
+    def __init__(self, id, token, order_type, trigger_price, reference_price, percentage, owner):
+        self.id = id
+        self.token = token
+        self.order_type = order_type
+        self.trigger_price = trigger_price
+        self.reference_price = reference_price
+        self.percentage = percentage
+        self.owner = owner
+        self.created = time.time()
+        self.active = True
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "token": self.token,
+            "type": self.order_type,
+            "trigger_price": self.trigger_price,
+            "reference_price": self.reference_price,
+            "percentage": self.percentage,
+            "owner": self.owner,
+            "active": self.active,
+        }
+
+
+class _Book:
+    """Open orders for one token: take-profits in a min-heap, stop-losses in a max-heap."""
+
+    __slots__ = ("take_profit", "stop_loss")
+
+    def __init__(self):
+        self.take_profit = []  # (trigger_price, id)
+        self.stop_loss = []    # (-trigger_price, id)
+
+
+class TriggerEngine:
+    """
+    Take-profit / stop-loss orders indexed by trigger price.
+
+    A take-profit fires once the price rises to its trigger, a stop-loss once
+    it falls to it. Each tick only looks at the top of the two heaps for its
+    token, so it costs O(log n) per fired order instead of a scan of every
+    open order. Cancelled orders are dropped lazily when they reach the top,
+    and the heaps are rebuilt once they make up `compact_ratio` of entries.
+
+    Every order has an owner, and only its owner can cancel it. At most
+    `max_orders` are open at once, `max_orders_per_owner` per owner (None
+    for no limit).
+
+    Fired orders are appended to a bounded event log (`max_events`) that
+    clients poll by sequence number; `on_fire(event)` is also called for each.
+    """
+
+    def __init__(self, max_events=10000, on_fire=None, max_orders=None, max_orders_per_owner=None, compact_ratio=0.5):
+        self.on_fire = on_fire
+        self.max_orders = max_orders
+        self.max_orders_per_owner = max_orders_per_owner
+        self.compact_ratio = compact_ratio
+        self._books = {}
+        self._orders = {}
+        self._owners = {}  # owner -> open order count
+        self._heap_entries = 0
+        self._cancelled_entries = 0
+        self._ids = itertools.count(1)
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._counters = {"registered": 0, "cancelled": 0, "fired": 0, "ticks": 0, "compactions": 0}
+
+    def register(self, token, order_type, percentage, reference_price, owner):
+        """
+        Open an order `percentage`% above (take profit) or below (stop loss)
+        `reference_price` for `owner`. Returns the Order; raises ValueError
+        on bad input or when a limit on open orders is reached.
+        """
+        if not owner:
+            raise ValueError("owner is required")
+        if order_type not in (TAKE_PROFIT, STOP_LOSS):
+            raise ValueError(f"Unknown order type: {order_type}")
+        percentage = float(percentage)
+        reference_price = float(reference_price)
+        if not 0 < percentage < (100 if order_type == STOP_LOSS else float("inf")):
+            raise ValueError("percentage out of range")
+        if not reference_price > 0:
+            raise ValueError("reference_price must be positive")
+
+        token = token.upper()
+        sign = 1 if order_type == TAKE_PROFIT else -1
+        trigger_price = reference_price * (1 + sign * percentage / 100)
+        with self._lock:
+            if self.max_orders is not None and len(self._orders) >= self.max_orders:
+                raise ValueError("Too many open orders; try again later")
+            if self.max_orders_per_owner is not None and self._owners.get(owner, 0) >= self.max_orders_per_owner:
+                raise ValueError(f"At most {self.max_orders_per_owner} open orders per owner")
+            order = Order(next(self._ids), token, order_type, trigger_price, reference_price, percentage, owner)
+            self._orders[order.id] = order
+            self._owners[owner] = self._owners.get(owner, 0) + 1
+            self._heap_entries += 1
+            book = self._books.setdefault(token, _Book())
+            if order_type == TAKE_PROFIT:
+                heapq.heappush(book.take_profit, (trigger_price, order.id))
+            else:
+                heapq.heappush(book.stop_loss, (-trigger_price, order.id))
+            self._counters["registered"] += 1
+        return order
+
+    def cancel(self, order_id, owner):
+        """Returns False if the order is unknown, already fired or not `owner`'s."""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None or order.owner != owner:
+                return False
+            del self._orders[order_id]
+            self._release(order)
+            self._counters["cancelled"] += 1
+            # Its heap entry stays behind until it surfaces or the heaps are rebuilt
+            self._cancelled_entries += 1
+            if self._cancelled_entries > self._heap_entries * self.compact_ratio:
+                self._compact()
+            return True
+
+    def get(self, order_id):
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def tick(self, token, price):
+        """Apply one price update and return the events it fired."""
+        fired = []
+        with self._lock:
+            self._counters["ticks"] += 1
+            book = self._books.get(token.upper())
+            if book is None:
+                return fired
+            heap = book.take_profit
+            while heap and heap[0][0] <= price:
+                self._fire(heapq.heappop(heap)[1], price, fired)
+            heap = book.stop_loss
+            while heap and -heap[0][0] >= price:
+                self._fire(heapq.heappop(heap)[1], price, fired)
+        if self.on_fire is not None:
+            for event in fired:
+                self.on_fire(event)
+        return fired
+
+    def tick_prices(self, prices, vs_currency="usd"):
+        """Feed a tools.get_crypto_prices() payload ({"sui": {"usd": 1.2}, ...})."""
+        fired = []
+        for coin_id, quote in prices.items():
+            token = COINGECKO_SYMBOLS.get(coin_id, coin_id.upper())
+            price = quote.get(vs_currency) if isinstance(quote, dict) else None
+            if price is not None:
+                fired.extend(self.tick(token, float(price)))
+        return fired
+
+    def events(self, since=0, limit=100):
+        """Fired events with a sequence number greater than `since`, oldest first."""
+        with self._lock:
+            return [e for e in self._events if e["seq"] > since][:limit]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["open_orders"] = len(self._orders)
+            stats["owners"] = len(self._owners)
+            stats["cancelled_entries"] = self._cancelled_entries
+            stats["tokens"] = len(self._books)
+            stats["last_seq"] = self._seq
+        return stats
+
+    def _fire(self, order_id, price, fired):
+        # Caller holds self._lock; cancelled orders are skipped here
+        self._heap_entries -= 1
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            self._cancelled_entries -= 1
+            return
+        self._release(order)
+        self._seq += 1
+        event = {"seq": self._seq, "price": price, "fired_at": time.time(), "order": order.to_dict()}
+        self._events.append(event)
+        self._counters["fired"] += 1
+        fired.append(event)
+
+    def _release(self, order):
+        # Caller holds self._lock
+        order.active = False
+        count = self._owners.pop(order.owner) - 1
+        if count:
+            self._owners[order.owner] = count
+
+    def _compact(self):
+        """Rebuild every book from the open orders, dropping cancelled entries. Caller holds self._lock."""
+        for token, book in list(self._books.items()):
+            book.take_profit = [entry for entry in book.take_profit if entry[1] in self._orders]
+            book.stop_loss = [entry for entry in book.stop_loss if entry[1] in self._orders]
+            if not book.take_profit and not book.stop_loss:
+                del self._books[token]
+                continue
+            heapq.heapify(book.take_profit)
+            heapq.heapify(book.stop_loss)
+        self._heap_entries = len(self._orders)
+        self._cancelled_entries = 0
+        self._counters["compactions"] += 1
+
+
+class PriceFeed:
+    """
+    Polls `get_prices()` every `interval` seconds on a daemon thread and feeds
+    the results to a TriggerEngine. Started on demand by start().
+    """
+
+    def __init__(self, engine, get_prices, interval=15):
+        self.engine = engine
+        self.get_prices = get_prices
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.engine.tick_prices(self.get_prices())
+            except Exception as e:
+                log.warning("Price feed tick failed: %s", e)
+            self._stop.wait(self.interval)
+
+
+def load_ticks(path):
+    """Replay file for tests and benchmarks: CSV rows of token,price (header optional)."""
+    ticks = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0] == "token":
+                continue
+            ticks.append((row[0].upper(), float(row[1])))
+    return ticks
@@ -0,0 +1,218 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+UPSTREAM_CALLS = registry.counter(
+    "agentic_upstream_calls_total", "Calls to third-party providers, by outcome.", ("provider", "outcome")
+)
+BREAKER_OPEN = registry.gauge(
+    "agentic_upstream_breaker_open", "1 while a provider's circuit breaker is open or half-open.", ("provider",)
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Our own bugs or a request the provider will never accept: retrying won't help
+NON_RETRYABLE = (TypeError, ValueError, KeyError, AttributeError)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling a provider that is rate limited locally or whose breaker is open."""
+
+
+def is_transient(e):
+    """Worth retrying: network errors, timeouts, throttling and 5xx; not 4xx or local bugs."""
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return not isinstance(e, NON_RETRYABLE)
+
+
+class TokenBucket:
+    """`rate` calls per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=0.0):
+        """Take a token, sleeping up to `max_wait` seconds for one. Returns False if none came."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            wait = (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return False
+            # Reserve the token now so concurrent callers queue up behind us
+            self._tokens -= 1
+        time.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. Then one probe call is let through (half-open):
+    success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a probe slot that allow() granted but was never used."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Returns True if this failure opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at) if self.state == OPEN else 0
+            return {"state": self.state, "consecutive_failures": self._failures, "retry_in_s": round(max(retry_in, 0), 1)}
+
+
+class Upstream:
+    """
+    Shared call path to one provider: a token bucket so we stay under its rate
+    limit, a circuit breaker so callers fail fast while it is down, and up to
+    `retries` jittered exponential-backoff retries for transient errors. Only
+    transient errors count towards opening the breaker.
+
+    call() raises UpstreamUnavailable without touching the network when the
+    bucket is empty (after waiting at most `max_wait`) or the breaker is open;
+    callers fall back to cached or empty results.
+    """
+
+    def __init__(self, name, rate=5.0, burst=10, max_wait=0.0, failure_threshold=5, reset_timeout=30,
+                 retries=1, backoff=0.2):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._counters = {"ok": 0, "error": 0, "retried": 0, "short_circuited": 0, "rate_limited": 0}
+        BREAKER_OPEN.set(0, name)
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                raise UpstreamUnavailable(f"{self.name} circuit breaker is open")
+            if not self.bucket.acquire(self.max_wait):
+                self.breaker.release()
+                self._count("rate_limited")
+                raise UpstreamUnavailable(f"{self.name} rate limit reached")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # A 4xx or a bug on our side says nothing about the provider's health
+                    self.breaker.release()
+                    self._count("error")
+                    raise
+                if self.breaker.record_failure():
+                    log.warning("%s circuit breaker opened after: %s", self.name, e)
+                BREAKER_OPEN.set(int(self.breaker.state != CLOSED), self.name)
+                if attempt >= self.retries or self.breaker.state != CLOSED:
+                    self._count("error")
+                    raise
+                self._count("retried")
+                # Full jitter keeps retries from many workers from arriving in lockstep
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                attempt += 1
+            else:
+                if self.breaker.state != CLOSED:
+                    log.info("%s circuit breaker closed", self.name)
+                self.breaker.record_success()
+                BREAKER_OPEN.set(0, self.name)
+                self._count("ok")
+                return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(self.breaker.snapshot())
+        return stats
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+        UPSTREAM_CALLS.inc(1, self.name, outcome)
+
+
+def _upstream(name, **defaults):
+    prefix = name.upper()
+
+    def env(key, cast):
+        return cast(os.environ.get(f"{prefix}_{key.upper()}", defaults[key]))
+
+    return Upstream(
+        name,
+        rate=env("rate", float),
+        burst=env("burst", int),
+        max_wait=env("max_wait", float),
+        failure_threshold=env("failure_threshold", int),
+        reset_timeout=env("reset_timeout", float),
+        retries=env("retries", int),
+        backoff=env("backoff", float),
+    )
+
+
+# One per provider, shared by every request and pool in the process
+ddgs = _upstream("ddgs", rate=8, burst=32, max_wait=0.25, failure_threshold=5, reset_timeout=30, retries=1, backoff=0.2)
+coingecko = _upstream("coingecko", rate=0.5, burst=5, max_wait=0.5, failure_threshold=3, reset_timeout=60, retries=1, backoff=0.3)
+
+
+def stats():
+    return {upstream.name: upstream.stats() for upstream in (ddgs, coingecko)}